@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, Optional, Tuple
+
+from metrics import METRICS
+
+CACHE_MAX_TENANTS: int = 1024
+CACHE_STALE_AFTER: int = int(os.getenv('CACHE_STALE_AFTER', 60))
+CACHE_REVALIDATE_WAIT: float = float(os.getenv('CACHE_REVALIDATE_WAIT', 5))
+
+
+class CacheEntry:
+    """Последний проверенный ответ API и разобранное состояние арендатора."""
+
+    __slots__ = ('response', 'state', 'updated_at')
+
+    def __init__(self, response, state, updated_at=None):
+        self.response = response
+        self.state = state
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    def age(self, now=None):
+        """Возраст записи в секундах."""
+        return (time.time() if now is None else now) - self.updated_at
+
+
+class ResponseCache:
+    """LRU-кэш ответов API по арендаторам с выгрузкой на диск.
+
+    get_or_refresh() читает по схеме stale-while-revalidate: запись
+    моложе stale_after отдаётся без запроса, устаревшая обновляется в
+    фоне, и если API не ответил за wait секунд, отдаётся прежняя.
+    Показатели кэша публикуются в METRICS под именем name.
+    """
+
+    def __init__(self, max_tenants=CACHE_MAX_TENANTS,
+                 stale_after=CACHE_STALE_AFTER, spill_dir=None,
+                 name='cache'):
+        self.max_tenants = max_tenants
+        self.stale_after = stale_after
+        self.spill_dir = spill_dir
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.stale_served = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._refreshing: dict = {}
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, tenant, response, state=None):
+        """Сохраняет ответ API арендатора, вытесняя самые старые записи."""
+        return self._store(tenant, CacheEntry(response, state))
+
+    def get(self, tenant) -> Optional[CacheEntry]:
+        """Возвращает запись арендатора из памяти или с диска."""
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is not None:
+                self._entries.move_to_end(tenant)
+                self.hits += 1
+                return entry
+        entry = self._load(tenant)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._store(tenant, entry)
+
+    def age(self, tenant) -> Optional[float]:
+        """Возраст закэшированного ответа арендатора в секундах."""
+        entry = self.get(tenant)
+        return None if entry is None else entry.age()
+
+    def is_stale(self, tenant):
+        """Проверяет, устарел ли закэшированный ответ арендатора."""
+        age = self.age(tenant)
+        return age is None or age > self.stale_after
+
+    def refresh(self, tenant, fetch: Callable[[], Tuple[object, object]]):
+        """Запускает фоновое обновление записи арендатора.
+
+        fetch возвращает ответ API и разобранное состояние. Возвращает
+        Future с новой записью; пока обновление идёт, повторный вызов
+        отдаёт тот же Future.
+        """
+        with self._lock:
+            future = self._refreshing.get(tenant)
+            if future is not None:
+                return future
+            future = self._refreshing[tenant] = Future()
+            self.refreshes += 1
+        threading.Thread(target=self._refresh, args=(tenant, fetch, future),
+                         daemon=True).start()
+        return future
+
+    def get_or_refresh(self, tenant,
+                       fetch: Callable[[], Tuple[object, object]],
+                       state=None, wait=CACHE_REVALIDATE_WAIT):
+        """Отдаёт свежую запись, иначе обновляет её, не дольше wait секунд.
+
+        При заданном state свежей считается только запись с этим
+        состоянием. Без записи в кэше ответ API ожидается сколько
+        потребуется. Ошибка обновления пробрасывается вызывающему.
+        """
+        entry = self.get(tenant)
+        try:
+            if (entry is not None and entry.age() <= self.stale_after
+                    and (state is None or entry.state == state)):
+                return entry
+            if entry is None:
+                response, new_state = fetch()
+                return self.put(tenant, response, new_state)
+            future = self.refresh(tenant, fetch)
+            try:
+                return future.result(timeout=wait)
+            except TimeoutError:
+                with self._lock:
+                    self.stale_served += 1
+                logging.warning('API отвечает медленно, используется ответ'
+                                f' из кэша возрастом {int(entry.age())} с.')
+                return entry
+        finally:
+            self.publish()
+
+    def metrics(self):
+        """Счётчики попаданий, промахов и вытеснений, возраст записей."""
+        now = time.time()
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refreshes': self.refreshes,
+                'stale_served': self.stale_served,
+                'max_age': round(max(
+                    (entry.age(now) for entry in self._entries.values()),
+                    default=0), 3),
+            }
+
+    def publish(self):
+        """Публикует показатели кэша в METRICS."""
+        METRICS.set(self.name, self.metrics())
+
+    def _store(self, tenant, entry):
+        with self._lock:
+            self._entries[tenant] = entry
+            self._entries.move_to_end(tenant)
+            while len(self._entries) > self.max_tenants:
+                evicted_tenant, evicted = self._entries.popitem(last=False)
+                self.evictions += 1
+                self._spill(evicted_tenant, evicted)
+        return entry
+
+    def _refresh(self, tenant, fetch, future):
+        try:
+            response, state = fetch()
+            future.set_result(self.put(tenant, response, state))
+        except Exception as error:
+            logging.warning(f'Сбой обновления кэша: {error}')
+            future.set_exception(error)
+        finally:
+            with self._lock:
+                self._refreshing.pop(tenant, None)
+
+    def _path(self, tenant):
+        name = hashlib.sha1(str(tenant).encode()).hexdigest()
+        return os.path.join(self.spill_dir, f'{name}.json')
+
+    def _spill(self, tenant, entry):
+        if not self.spill_dir:
+            return
+        try:
+            with open(self._path(tenant), 'w', encoding='utf-8') as file:
+                json.dump({'response': entry.response, 'state': entry.state,
+                           'updated_at': entry.updated_at}, file)
+        except (OSError, TypeError) as error:
+            logging.error(f'Не удалось выгрузить кэш на диск: {error}')
+
+    def _load(self, tenant) -> Optional[CacheEntry]:
+        if not self.spill_dir:
+            return None
+        path = self._path(tenant)
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logging.error(f'Не удалось прочитать кэш с диска: {error}')
+            return None
+        os.remove(path)
+        return CacheEntry(data['response'], data['state'],
+                          data['updated_at'])
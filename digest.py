@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+from metrics import METRICS
+
+DIGEST_WINDOW: str = os.getenv('DIGEST_WINDOW')
+DIGEST_TITLE: str = 'Изменились статусы проверки работ:'
+
+
+class Digest:
+    """Сборщик смен статусов в одно сообщение на чат.
+
+    Смены копятся по чатам window секунд с первой из них (при window=0 —
+    до конца цикла опроса). Из нескольких смен одной работы в сообщение
+    попадает только последняя.
+    """
+
+    def __init__(self, window=0):
+        self.window = window
+        self.transitions = 0
+        self.flushed = 0
+        self.superseded = 0
+        self.sends = 0
+        self._pending: dict = {}
+        self._batches: dict = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, chat_ids, key, message, changed_at=None, cohort=''):
+        """Добавляет смену статуса работы в сборки всех чатов."""
+        homework = key[0]
+        item = (key, message, changed_at or 0, cohort)
+        now = time.monotonic()
+        with self._lock:
+            for chat_id in chat_ids:
+                pending = self._pending.setdefault(chat_id, {})
+                self._batches.setdefault(chat_id, [now, 0])[1] += 1
+                self.transitions += 1
+                previous = pending.get(homework)
+                if previous is not None:
+                    self.superseded += 1
+                    if previous[2] > item[2]:
+                        continue
+                pending[homework] = item
+            self._publish()
+
+    def holds(self, chat_ids):
+        """Есть ли у какого-либо из чатов несобранные смены."""
+        with self._lock:
+            return any(chat_id in self._pending for chat_id in chat_ids)
+
+    def pop(self, chat_ids=None, now=None):
+        """Забирает готовые сборки.
+
+        chat_ids ограничивает выборку этими чатами и отдаёт их сразу,
+        иначе отдаются чаты, у которых истекло окно. Возвращает список
+        (chat_id, key, text, changed_at, cohort).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if chat_ids is None:
+                chat_ids = [chat_id
+                            for chat_id, (opened, _) in self._batches.items()
+                            if now - opened >= self.window]
+            ready = []
+            for chat_id in chat_ids:
+                if chat_id not in self._pending:
+                    continue
+                ready.append((chat_id,) + render(self._pending.pop(chat_id)))
+                self.flushed += self._batches.pop(chat_id)[1]
+            self.sends += len(ready)
+            self._publish()
+        return ready
+
+    def _publish(self):
+        METRICS.set('digest_transitions', self.transitions)
+        METRICS.set('digest_superseded', self.superseded)
+        METRICS.set('digest_sends', self.sends)
+        METRICS.set('digest_sends_saved', self.flushed - self.sends)
+
+
+def render(pending):
+    """Собирает одно сообщение из смен статусов разных работ.
+
+    Возвращает ключ доставки, текст, время самой ранней смены и когорту.
+    """
+    items = sorted(pending.values(), key=lambda item: item[2])
+    if len(items) == 1:
+        key, message, changed_at, cohort = items[0]
+        return key, message, changed_at or None, cohort
+    text = '\n'.join((DIGEST_TITLE,) + tuple(item[1] for item in items))
+    status = ';'.join(f'{key[0]}:{key[1]}' for key, *_ in items)
+    changed_at = min(item[2] for item in items) or None
+    return ('', status), text, changed_at, items[0][3]
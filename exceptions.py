@@ -2,13 +2,55 @@ class MissingEnvironmentVariable(Exception):
     pass
 
 
+class TransientError(Exception):
+    """Временный сбой: запрос можно сразу повторить."""
+
+
+class PermanentError(Exception):
+    """Сбой, который не пройдёт без смены настроек или кода."""
+
+
+class SchemaError(PermanentError):
+    pass
+
+
 class InvalidStatusCodeAPI(Exception):
     pass
 
 
-class APIReturningUnknownArgument(Exception):
+class ServerError(InvalidStatusCodeAPI, TransientError):
+    pass
+
+
+class Unauthorized(InvalidStatusCodeAPI, PermanentError):
+    pass
+
+
+class APIConnectionError(ConnectionError, TransientError):
     pass
 
 
-class jsonDecodeError(Exception):
+class APIReturningUnknownArgument(SchemaError):
     pass
+
+
+class InvalidResponseType(TypeError, SchemaError):
+    pass
+
+
+class MissingResponseKey(KeyError, SchemaError):
+    pass
+
+
+class ChatUnavailable(PermanentError):
+    """Telegram отказал в отправке в чат: не найден, бот заблокирован."""
+
+
+class jsonDecodeError(TransientError):
+    pass
+
+
+class TooManyRequests(InvalidStatusCodeAPI):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,107 @@
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import METRICS
+
+GOVERNOR_PATH: str = os.getenv('GOVERNOR_PATH', 'governor.sqlite3')
+GOVERNOR_RATE: float = float(os.getenv('GOVERNOR_RATE', 2))
+GOVERNOR_BURST: float = float(os.getenv('GOVERNOR_BURST', 10))
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+'''
+
+
+class Governor:
+    """Общий для всех процессов лимит запросов к API в виде token bucket.
+
+    Состояние корзины хранится в SQLite, поэтому процессы на одной
+    машине делят один лимит. reserve() не отказывает, а выдаёт слот
+    в будущем: вызывающий откладывает запрос на полученную задержку.
+    """
+
+    def __init__(self, path=GOVERNOR_PATH, rate=GOVERNOR_RATE,
+                 burst=GOVERNOR_BURST, name='practicum'):
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self.deferred = 0
+        self.delay_total = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30,
+                                     check_same_thread=False,
+                                     isolation_level=None)
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(
+                'INSERT OR IGNORE INTO buckets (name, tokens, updated)'
+                ' VALUES (?, ?, ?)', (name, burst, time.time()))
+
+    def reserve(self, now=None):
+        """Занимает слот для запроса и возвращает задержку до него."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                tokens, updated = self._conn.execute(
+                    'SELECT tokens, updated FROM buckets WHERE name = ?',
+                    (self.name,)).fetchone()
+                if now > updated:
+                    tokens = min(self.burst,
+                                 tokens + (now - updated) * self.rate)
+                    updated = now
+                tokens -= 1
+                self._conn.execute(
+                    'UPDATE buckets SET tokens = ?, updated = ?'
+                    ' WHERE name = ?', (tokens, updated, self.name))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            delay = updated - now + max(-tokens, 0) / self.rate
+            if delay > 0:
+                self.deferred += 1
+                self.delay_total += delay
+                METRICS.set('governor_deferred', self.deferred)
+                METRICS.set('governor_delay_total', round(self.delay_total, 3))
+            METRICS.set('governor_delay', round(delay, 3))
+        return delay
+
+    def pause(self, seconds, now=None):
+        """Останавливает выдачу слотов на seconds секунд (Retry-After)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute(
+                'UPDATE buckets SET tokens = MIN(tokens, 0),'
+                ' updated = MAX(updated, ?) WHERE name = ?',
+                (now + seconds, self.name))
+        logging.warning(f'API ограничил частоту запросов, пауза {seconds} с.')
+
+    def wait(self):
+        """Занимает слот и ждёт его наступления."""
+        delay = self.reserve()
+        if delay > 0:
+            threading.Event().wait(delay)
+        return delay
+
+    def paced(self, func):
+        """Обёртка над func, занимающая слот перед каждым повтором.
+
+        Слот для первого вызова вызывающий занимает сам, поэтому
+        повторы через RetryPolicy не превышают общий лимит.
+        """
+        calls = itertools.count()
+
+        def call(*args):
+            if next(calls):
+                self.wait()
+            return func(*args)
+        return call
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import METRICS
+
+HEALTH_HOST: str = os.getenv('HEALTH_HOST', '127.0.0.1')
+HEALTH_PORT: int = int(os.getenv('HEALTH_PORT', 0))
+HEALTH_LAG_FACTOR: int = 2
+
+
+def since(values, name, now):
+    """Секунды с события или с запуска, если события ещё не было."""
+    return round(now - values.get(name, values['started']), 3)
+
+
+def report(values, loop_period, poll_period, now=None):
+    """Отчёт о состоянии: задержки цикла, свежесть API и Telegram."""
+    now = time.time() if now is None else now
+    state = {
+        'loop_lag': since(values, 'cycle', now),
+        'since_api_success': since(values, 'api_success', now),
+        'since_send_success': since(values, 'send_success', now),
+        'scheduler_lag': values.get('scheduler_lag', 0),
+        'queue_depth': values.get('queue_depth', 0),
+        'outbox_depth': values.get('outbox_depth', 0),
+        'outbox_bytes': values.get('outbox_bytes', 0),
+        'outbox_shed': values.get('outbox_shed', 0),
+        'outbox_capacity': values.get('outbox_capacity', 0),
+        'outbox_dead': values.get('outbox_dead', 0),
+        'backpressure': values.get('backpressure', 0),
+        'overdue_tenants': values.get('overdue_tenants', 0),
+        'parked_tenants': values.get('parked_tenants', 0),
+        'validation_time': values.get('validation_time', 0),
+        'retries': values.get('retries', 0),
+        'digest_sends_saved': values.get('digest_sends_saved', 0),
+        'governor_deferred': values.get('governor_deferred', 0),
+        'governor_delay_total': values.get('governor_delay_total', 0),
+    }
+    state['sinks'] = values.get('sinks', {})
+    state['cache'] = values.get('cache', {})
+    state['latency'] = METRICS.latency_report()
+    state['live'] = state['loop_lag'] <= loop_period * HEALTH_LAG_FACTOR
+    state['ready'] = (state['live']
+                      and state['since_api_success']
+                      <= poll_period * HEALTH_LAG_FACTOR
+                      and not state['overdue_tenants'])
+    return state
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Ответы на /health (процесс жив) и /ready (данные свежие)."""
+
+    loop_period = 600
+    poll_period = 600
+
+    def do_GET(self):
+        """Отдаёт отчёт о состоянии в JSON."""
+        checks = {'/health': 'live', '/ready': 'ready'}
+        if self.path not in checks:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        state = report(METRICS.snapshot(), self.loop_period,
+                       self.poll_period)
+        status = (HTTPStatus.OK if state[checks[self.path]]
+                  else HTTPStatus.SERVICE_UNAVAILABLE)
+        body = json.dumps(state).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f'Проба здоровья: {format % args}')
+
+
+def start_health_server(loop_period, poll_period, port=HEALTH_PORT,
+                        host=HEALTH_HOST):
+    """Запускает HTTP-сервер проб в фоновом потоке, если задан порт.
+
+    loop_period — как часто отмечается итерация цикла, poll_period —
+    как часто ожидается успешный ответ API.
+    """
+    if not port:
+        return None
+    handler = type('Handler', (HealthHandler,), {
+        'loop_period': loop_period, 'poll_period': poll_period})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f'Пробы здоровья доступны на http://{host}:{port}/health')
+    return server
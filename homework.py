@@ -4,10 +4,18 @@ import telegram
 import time
 import logging
 import datetime as dt
+import email.utils
 import exceptions as ex
 
+from cache import ResponseCache
 from dotenv import load_dotenv
+from governor import Governor
+from health import start_health_server
 from http import HTTPStatus
+from metrics import METRICS
+from outbox import PRIORITY_NOTICE, PRIORITY_STATUS, Outbox
+from profiler import Profiler
+from retry import RetryPolicy
 
 load_dotenv()
 
@@ -19,6 +27,12 @@ RETRY_PERIOD: int = 600
 ENDPOINT: str = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS: dict = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
+RETRY_AFTER_DEFAULT: int = 60
+REQUEST_TIMEOUT: int = 30
+CACHE_MAX_AGE: int = RETRY_PERIOD * 6
+CACHE_DIR: str = os.getenv('CACHE_DIR')
+OUTBOX_PATH: str = os.getenv('OUTBOX_PATH', 'homework_outbox.sqlite3')
+
 HOMEWORK_VERDICTS: dict = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
@@ -34,36 +48,96 @@ def check_tokens():
 
 def send_message(bot, message):
     """Отправляет сообщение в Telegram чат."""
+    return send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_to_chat(bot, chat_id, message):
+    """Отправляет сообщение в указанный чат, сообщая об успехе."""
     try:
         bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
+            chat_id=chat_id,
             text=message
         )
         logging.debug(f'Сообщение <<<{message}>>> успешно отправлено.')
+        METRICS.mark('send_success')
+        return True
+    except (telegram.error.BadRequest, telegram.error.Unauthorized) as error:
+        # Чат не найден или бот заблокирован: повтор не поможет
+        logging.error(f'Сбой при отправке сообщения: {error}')
+        raise ex.ChatUnavailable(str(error)) from error
     except Exception as error:
         logging.error(f'Сбой при отправке сообщения: {error}')
+        return False
+
+
+def deliver(bot, outbox, key, message, changed_at=None,
+            priority=PRIORITY_STATUS):
+    """Отправляет сообщение, сохраняя его в outbox до подтверждения."""
+    return outbox.send(TELEGRAM_CHAT_ID, *key, message,
+                       lambda chat_id, text: send_message(bot, text),
+                       changed_at, priority=priority)
 
 
 def get_api_answer(timestamp):
     """Делаем запрос к эндпоинту API-сервиса."""
+    return request_api(HEADERS, timestamp)
+
+
+def request_api(headers, timestamp, decode=None):
+    """Запрос к эндпоинту API-сервиса с заголовками конкретного студента.
+
+    decode разбирает тело ответа вместо response.json().
+    """
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS,
-                                params={'from_date': timestamp})
+        response = requests.get(ENDPOINT, headers=headers,
+                                params={'from_date': timestamp},
+                                timeout=REQUEST_TIMEOUT)
     except Exception as exc:
         logging.error('Ошибка при подключении к эндпоинту.')
-        raise ConnectionError from exc
+        raise ex.APIConnectionError from exc
 
     if response.status_code == HTTPStatus.OK:
         try:
-            response_json = response.json()
+            response_json = (response.json() if decode is None
+                             else decode(response.content))
+            METRICS.mark('api_success')
             return response_json
+        except ex.SchemaError:
+            raise
         except Exception as exc:
             logging.error('Ошибка при десириализации json.')
             raise ex.jsonDecodeError from exc
-    else:
+    elif response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
         logging.error(f'Неверный ответ API: {response.status_code}.')
-        raise ex.InvalidStatusCodeAPI(f'Неверный ответ API:'
-                                      f' {response.status_code}')
+        headers = getattr(response, 'headers', None) or {}
+        raise ex.TooManyRequests(f'Неверный ответ API:'
+                                 f' {response.status_code}',
+                                 parse_retry_after(headers.get('Retry-After')))
+    logging.error(f'Неверный ответ API: {response.status_code}.')
+    raise status_error(response.status_code)(f'Неверный ответ API:'
+                                             f' {response.status_code}')
+
+
+def status_error(status_code):
+    """Класс исключения для кода ответа API, отличного от 200 и 429."""
+    if status_code in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+        return ex.Unauthorized
+    if status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        return ex.ServerError
+    return ex.InvalidStatusCodeAPI
+
+
+def parse_retry_after(value):
+    """Секунды ожидания из заголовка Retry-After."""
+    if not value:
+        return RETRY_AFTER_DEFAULT
+    if value.isdigit():
+        return int(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return RETRY_AFTER_DEFAULT
+    return max(int(retry_at.timestamp() - time.time()), 0)
 
 
 def check_response(response):
@@ -71,28 +145,32 @@ def check_response(response):
     if not isinstance(response, dict):
         logging.error(f'Ответ API  приходит не в ожидаемом виде. Получен'
                       f' {type(response)}, а ожидался dict.')
-        raise TypeError(f'Ответ API  приходит не в ожидаемом виде. Получен'
-                        f' {type(response)},а ожидался dict.')
+        raise ex.InvalidResponseType(f'Ответ API  приходит не в ожидаемом'
+                                     f' виде. Получен {type(response)},а'
+                                     f' ожидался dict.')
 
     if 'homeworks' not in response or 'current_date' not in response:
         logging.error('Значение одной из переменной в ответе API не найдено.')
-        raise KeyError('Значение одной из переменной в ответе API не найдено.')
+        raise ex.MissingResponseKey('Значение одной из переменной в ответе'
+                                    ' API не найдено.')
 
     homework = response['homeworks']
     if not isinstance(homework, list):
         logging.error(f'Ответ API под ключом "homeworks" приходит не в'
                       f' ожидаемом виде. Получен {type(homework)},'
                       f' а ожидался list.')
-        raise TypeError(f'Ответ API под ключом "homeworks" приходит не в'
-                        f' ожидаемом виде. Получен {type(homework)},'
-                        f' а ожидался list.')
+        raise ex.InvalidResponseType(f'Ответ API под ключом "homeworks"'
+                                     f' приходит не в ожидаемом виде.'
+                                     f' Получен {type(homework)},'
+                                     f' а ожидался list.')
 
 
 def parse_status(homework):
     """Извлекает из информации о домашней работе статус этой работы."""
     if 'status' not in homework or 'homework_name' not in homework:
         logging.error('Значение одной из переменной в ответе API не найдено.')
-        raise KeyError('Значение одной из переменной в ответе API не найдено.')
+        raise ex.MissingResponseKey('Значение одной из переменной в ответе'
+                                    ' API не найдено.')
 
     if homework['status'] in HOMEWORK_VERDICTS:
         return ('Изменился статус проверки работы'
@@ -107,9 +185,86 @@ def parse_status(homework):
                                              f' {homework["status"]}')
 
 
+def delivery_key(homework):
+    """Ключ идемпотентной доставки уведомления о работе."""
+    status = homework['status']
+    if homework.get('date_updated'):
+        status = f'{status}@{homework["date_updated"]}'
+    return homework['homework_name'], status
+
+
+def notice_key(message):
+    """Ключ доставки сообщения о сбое или об отсутствии обновлений.
+
+    Такие сообщения повторяются дословно, поэтому каждое получает свой
+    ключ, а от повторов защищает сравнение с прошлым сообщением.
+    """
+    return '', f'{message}@{time.time_ns()}'
+
+
+def parse_date(value):
+    """Переводит date_updated из ответа API в timestamp.
+
+    Дата нужна только для подсчёта задержки доставки, поэтому
+    нераспознанная дата не мешает уведомлению: как и отсутствующая,
+    она даёт 0.
+    """
+    if not value:
+        return 0
+    try:
+        moment = dt.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        logging.warning(f'Не удалось разобрать дату {value!r}.')
+        return 0
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=dt.timezone.utc)
+    return int(moment.timestamp())
+
+
+def poll_status(cache, governor, retry, timestamp):
+    """Получает статус последней работы, при сбое API берёт его из кэша.
+
+    Ответ читается из кэша по схеме stale-while-revalidate. Возвращает
+    ключ доставки, текст сообщения и время смены статуса.
+    """
+    def fetch():
+        # Получаем ответ API приведённый к типу данных Python
+        governor.wait()
+        api_answer = retry.call(governor.paced(get_api_answer), timestamp)
+
+        # Проверка API на соответствие документации
+        check_response(api_answer)
+
+        # Извлекаем нужную информацию о последней домашке
+        if len(api_answer['homeworks']) > 0:
+            homework = api_answer['homeworks'][0]
+            parse_status_answer = parse_status(homework)
+            key = delivery_key(homework)
+            changed_at = parse_date(homework.get('date_updated')) or None
+        else:
+            parse_status_answer = 'Обновлений в ДЗ пока нет'
+            key = notice_key(parse_status_answer)
+            changed_at = None
+        return api_answer, (key, parse_status_answer, changed_at)
+
+    try:
+        entry = cache.get_or_refresh(TELEGRAM_CHAT_ID, fetch)
+    except (ex.TransientError, ex.TooManyRequests) as error:
+        if isinstance(error, ex.TooManyRequests):
+            governor.pause(error.retry_after)
+        entry = cache.get(TELEGRAM_CHAT_ID)
+        if entry is None or entry.age() > CACHE_MAX_AGE:
+            raise
+        logging.warning('API недоступен, используется ответ из кэша'
+                        f' возрастом {int(entry.age())} с.')
+    key, parse_status_answer, changed_at = entry.state
+    return tuple(key), parse_status_answer, changed_at
+
+
 def main():
     """Основная логика работы бота."""
     STATUS_HOMEWORK = None
+    status_known = False
 
     logging.debug('--------------')
 
@@ -120,6 +275,15 @@ def main():
             'Отсутствуют переменные окружения!')
 
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    cache = ResponseCache(spill_dir=CACHE_DIR)
+    governor = Governor()
+    retry = RetryPolicy()
+    outbox = Outbox(OUTBOX_PATH)
+    outbox.prune()
+    outbox.start_worker(lambda chat_id, text: send_to_chat(bot, chat_id, text))
+    profiler = Profiler()
+    profiler.install_signal()
+    start_health_server(RETRY_PERIOD, RETRY_PERIOD)
 
     timestamp = int(time.mktime((dt.datetime.now()
                                  - dt.timedelta(days=50)).timetuple()))
@@ -127,29 +291,27 @@ def main():
     while True:
         try:
             logging.debug('Начало новой итерации')
+            METRICS.mark('cycle')
 
-            # Получаем ответ API приведённый к типу данных Python
-            api_answer = get_api_answer(timestamp)
-
-            # Проверка API на соответствие документации
-            check_response(api_answer)
-
-            # Извлекаем нужную информацию о последней домашке
-            if len(api_answer['homeworks']) > 0:
-                parse_status_answer = parse_status(api_answer['homeworks'][0])
-            else:
-                parse_status_answer = 'Обновлений в ДЗ пока нет'
+            with profiler.cycle():
+                key, parse_status_answer, changed_at = poll_status(
+                    cache, governor, retry, timestamp)
 
-            # Отправляем сообщение пользователю
-            if STATUS_HOMEWORK != parse_status_answer:
-                send_message(bot, parse_status_answer)
-                STATUS_HOMEWORK = parse_status_answer
+                # Отправляем сообщение пользователю
+                if STATUS_HOMEWORK != parse_status_answer:
+                    # До первого ответа статус неизвестен, и задержку
+                    # доставки считать не от чего
+                    deliver(bot, outbox, key, parse_status_answer,
+                            changed_at if status_known else None)
+                    STATUS_HOMEWORK = parse_status_answer
+                status_known = True
 
         except Exception as error:
             logging.critical(f'Сбой в работе программы: {error}')
             message = f'Сбой в работе программы: {error}'
             if message != STATUS_HOMEWORK:
-                send_message(bot, message)
+                deliver(bot, outbox, notice_key(message), message,
+                        priority=PRIORITY_NOTICE)
                 STATUS_HOMEWORK = message
             logging.debug('--------------')
 
@@ -0,0 +1,98 @@
+import bisect
+import logging
+import os
+import time
+
+METRICS_STARTED: float = time.time()
+LATENCY_BUCKETS: tuple = (60, 300, 600, 900, 1200, 1800, 3600, 7200, 21600,
+                          86400)
+NOTIFY_SLO: int = int(os.getenv('NOTIFY_SLO', 1200))
+
+
+class Histogram:
+    """Гистограмма задержек по корзинам LATENCY_BUCKETS."""
+
+    __slots__ = ('counts', 'count', 'total', 'breaches')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.breaches = 0
+
+    def observe(self, value, slo=NOTIFY_SLO):
+        """Учитывает задержку и сообщает, нарушен ли SLO."""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        breached = value > slo
+        self.breaches += breached
+        return breached
+
+    def quantile(self, q):
+        """Верхняя граница корзины, в которую попадает квантиль q."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),),
+                                self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        """Сводка гистограммы для отчёта."""
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'breaches': self.breaches,
+            'buckets': dict(zip(map(str, LATENCY_BUCKETS + ('inf',)),
+                                self.counts)),
+        }
+
+
+class Metrics:
+    """Показатели работы цикла опроса для проб здоровья.
+
+    Значения пишутся в словарь простым присваиванием, а читаются
+    его копией, поэтому ни запись, ни чтение не берут блокировок.
+    """
+
+    def __init__(self):
+        self.values: dict = {'started': METRICS_STARTED}
+        self.latency: dict = {}
+
+    def mark(self, name):
+        """Запоминает время события."""
+        self.values[name] = time.time()
+
+    def set(self, name, value):
+        """Задаёт текущее значение показателя."""
+        self.values[name] = value
+
+    def observe_latency(self, cohort, seconds):
+        """Учитывает задержку от смены статуса до доставки уведомления.
+
+        Вызывается под блокировкой outbox, поэтому гистограммы
+        одной когорты не обновляются конкурентно.
+        """
+        histogram = self.latency.get(cohort)
+        if histogram is None:
+            histogram = self.latency[cohort] = Histogram()
+        if histogram.observe(seconds):
+            logging.warning(f'Уведомление доставлено через {int(seconds)} с,'
+                            f' дольше SLO {NOTIFY_SLO} с.')
+
+    def latency_report(self):
+        """Сводка задержек уведомлений по когортам."""
+        return {cohort: histogram.as_dict()
+                for cohort, histogram in list(self.latency.items())}
+
+    def snapshot(self):
+        """Копия всех показателей."""
+        return dict(self.values)
+
+
+METRICS = Metrics()
@@ -0,0 +1,322 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+import exceptions as ex
+from metrics import METRICS
+
+OUTBOX_BATCH_SIZE: int = 50
+OUTBOX_RETRY_INTERVAL: int = 30
+OUTBOX_MAX_DELAY: int = 3600
+OUTBOX_KEEP_DELIVERED: int = 60 * 24 * 60 * 60
+OUTBOX_CAPACITY: int = int(os.getenv('OUTBOX_CAPACITY', 10000))
+OUTBOX_MAX_ATTEMPTS: int = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 20))
+PRIORITY_NOTICE: int = 0
+PRIORITY_STATUS: int = 1
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    chat_id TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    text TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    changed_at REAL,
+    cohort TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (chat_id, homework, status)
+);
+CREATE TABLE IF NOT EXISTS delivered (
+    chat_id TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    delivered_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, homework, status)
+);
+CREATE TABLE IF NOT EXISTS dead (
+    chat_id TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    text TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT NOT NULL,
+    died_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt ON outbox (next_attempt);
+'''
+
+# Устаревшие статусы: у той же работы в том же чате есть более новая запись
+SHED_SUPERSEDED: str = '''
+DELETE FROM outbox WHERE rowid IN (
+    SELECT rowid FROM outbox AS old WHERE homework != '' AND EXISTS (
+        SELECT 1 FROM outbox AS new WHERE new.chat_id = old.chat_id
+        AND new.homework = old.homework AND new.rowid > old.rowid)
+    ORDER BY rowid LIMIT ?)
+'''
+SHED_NOTICES: str = f'''
+DELETE FROM outbox WHERE rowid IN (
+    SELECT rowid FROM outbox WHERE priority = {PRIORITY_NOTICE}
+    ORDER BY rowid LIMIT ?)
+'''
+
+
+class Outbox:
+    """Надёжная очередь уведомлений в Telegram поверх SQLite.
+
+    Очередь ограничена capacity записями. При переполнении сначала
+    отбрасываются устаревшие статусы работ, затем сообщения о сбоях;
+    смены статусов не отбрасываются, а saturated() сигнализирует
+    опросу, что новые уведомления нужно придержать.
+
+    Функция отправки возвращает True при успехе и False при временном
+    сбое, а при недоступном чате бросает ex.PermanentError. Такие
+    уведомления и те, что не ушли за OUTBOX_MAX_ATTEMPTS попыток,
+    переносятся в таблицу dead и перестают занимать очередь.
+    """
+
+    def __init__(self, path, capacity=OUTBOX_CAPACITY):
+        self.capacity = capacity
+        self.shed = 0
+        METRICS.set('outbox_capacity', capacity)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            self.dead = self._conn.execute(
+                'SELECT COUNT(*) FROM dead').fetchone()[0]
+        METRICS.set('outbox_dead', self.dead)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def add(self, chat_id, homework, status, text, changed_at=None,
+            cohort='', priority=PRIORITY_STATUS):
+        """Записывает уведомление перед отправкой.
+
+        Фоновый поток подхватит запись не раньше чем через
+        OUTBOX_RETRY_INTERVAL, если её не подтвердят раньше.
+        changed_at — время смены статуса, от него считается задержка
+        доставки, priority — PRIORITY_STATUS или PRIORITY_NOTICE для
+        сообщений о сбоях. Возвращает False, если такое уведомление уже
+        было доставлено или уже ждёт отправки.
+        """
+        key = (str(chat_id), homework, status)
+        with self._lock, self._conn:
+            delivered = self._conn.execute(
+                'SELECT 1 FROM delivered WHERE chat_id = ? AND homework = ?'
+                ' AND status = ?', key).fetchone()
+            if delivered:
+                return False
+            inserted = self._conn.execute(
+                'INSERT OR IGNORE INTO outbox (chat_id, homework, status,'
+                ' text, next_attempt, changed_at, cohort, priority)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                key + (text, time.time() + OUTBOX_RETRY_INTERVAL,
+                       changed_at, cohort, priority)).rowcount
+            if inserted:
+                self._shed()
+        return bool(inserted)
+
+    def _shed(self):
+        """Сбрасывает лишние записи сверх capacity."""
+        depth, size = self._stats()
+        for query in (SHED_SUPERSEDED, SHED_NOTICES):
+            if depth <= self.capacity:
+                break
+            shed = self._conn.execute(query,
+                                      (depth - self.capacity,)).rowcount
+            if shed:
+                self.shed += shed
+                depth, size = self._stats()
+                logging.warning(f'Outbox переполнен, отброшено'
+                                f' уведомлений: {shed}.')
+        METRICS.set('outbox_depth', depth)
+        METRICS.set('outbox_bytes', size)
+        METRICS.set('outbox_shed', self.shed)
+
+    def _stats(self):
+        return self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0)'
+            ' FROM outbox').fetchone()
+
+    def saturated(self):
+        """Сообщает, что очередь заполнена до capacity."""
+        return len(self) >= self.capacity
+
+    def ack(self, chat_id, homework, status):
+        """Отмечает уведомление доставленным и убирает его из очереди."""
+        key = (str(chat_id), homework, status)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT changed_at, cohort FROM outbox WHERE chat_id = ?'
+                ' AND homework = ? AND status = ?', key).fetchone()
+            self._conn.execute(
+                'DELETE FROM outbox WHERE chat_id = ? AND homework = ?'
+                ' AND status = ?', key)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO delivered'
+                ' (chat_id, homework, status, delivered_at)'
+                ' VALUES (?, ?, ?, ?)', key + (now,))
+            if row and row[0]:
+                changed_at, cohort = row
+                METRICS.observe_latency(cohort, now - changed_at)
+
+    def fail(self, chat_id, homework, status, error=None):
+        """Откладывает повторную отправку с экспоненциальной задержкой.
+
+        error — постоянная ошибка отправки: уведомление сразу уходит в
+        dead, как и после OUTBOX_MAX_ATTEMPTS неудачных попыток.
+        """
+        key = (str(chat_id), homework, status)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE outbox SET attempts = attempts + 1,'
+                ' next_attempt = ? + MIN(? * (1 << MIN(attempts, 16)), ?)'
+                ' WHERE chat_id = ? AND homework = ? AND status = ?',
+                (time.time(), OUTBOX_RETRY_INTERVAL, OUTBOX_MAX_DELAY) + key)
+            if error is None:
+                error = 'Превышено число попыток отправки'
+                condition = f' AND attempts >= {OUTBOX_MAX_ATTEMPTS}'
+            else:
+                condition = ''
+            buried = self._conn.execute(
+                'INSERT INTO dead SELECT chat_id, homework, status, text,'
+                ' attempts, ?, ? FROM outbox WHERE chat_id = ?'
+                ' AND homework = ? AND status = ?' + condition,
+                (str(error), time.time()) + key).rowcount
+            if buried:
+                self._conn.execute(
+                    'DELETE FROM outbox WHERE chat_id = ? AND homework = ?'
+                    ' AND status = ?', key)
+                self.dead += buried
+                METRICS.set('outbox_dead', self.dead)
+        if buried:
+            logging.error(f'Уведомление в чат {chat_id} не доставлено и'
+                          f' перенесено в dead: {error}')
+
+    def attempt(self, chat_id, homework, status, text,
+                send: Callable[[str, str], bool]):
+        """Отправляет уведомление из очереди и отмечает результат."""
+        try:
+            sent = send(chat_id, text)
+        except ex.PermanentError as error:
+            self.fail(chat_id, homework, status, error)
+            return False
+        if sent:
+            self.ack(chat_id, homework, status)
+            return True
+        self.fail(chat_id, homework, status)
+        return False
+
+    def send(self, chat_id, homework, status, text,
+             send: Callable[[str, str], bool], changed_at=None, cohort='',
+             priority=PRIORITY_STATUS):
+        """Отправляет уведомление через outbox.
+
+        Возвращает None, если уведомление уже было доставлено или его
+        отправит фоновый поток, иначе результат отправки.
+        """
+        if not self.add(chat_id, homework, status, text, changed_at, cohort,
+                        priority):
+            logging.debug(f'Сообщение <<<{text}>>> уже было доставлено'
+                          ' или ждёт отправки.')
+            return None
+        return self.attempt(chat_id, homework, status, text, send)
+
+    def due(self, limit=OUTBOX_BATCH_SIZE, now=None):
+        """Возвращает пачку уведомлений, время отправки которых подошло."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._conn.execute(
+                'SELECT chat_id, homework, status, text FROM outbox'
+                ' WHERE next_attempt <= ?'
+                ' ORDER BY priority DESC, next_attempt LIMIT ?',
+                (now, limit)).fetchall()
+
+    def claim(self, limit=OUTBOX_BATCH_SIZE):
+        """Забирает пачку подошедших уведомлений на отправку.
+
+        Время следующей попытки у них сдвигается на
+        OUTBOX_RETRY_INTERVAL, поэтому повторный вызов до подтверждения
+        или сбоя их не вернёт.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                'SELECT chat_id, homework, status, text FROM outbox'
+                ' WHERE next_attempt <= ?'
+                ' ORDER BY priority DESC, next_attempt LIMIT ?',
+                (now, limit)).fetchall()
+            self._conn.executemany(
+                'UPDATE outbox SET next_attempt = ? WHERE chat_id = ?'
+                ' AND homework = ? AND status = ?',
+                [(now + OUTBOX_RETRY_INTERVAL,) + row[:3] for row in rows])
+        return rows
+
+    def drain(self, send: Callable[[str, str], bool],
+              batch_size=OUTBOX_BATCH_SIZE):
+        """Повторно отправляет пачку неудавшихся уведомлений."""
+        sent = failed = 0
+        for chat_id, homework, status, text in self.claim(batch_size):
+            if self.attempt(chat_id, homework, status, text, send):
+                sent += 1
+            else:
+                failed += 1
+        with self._lock:
+            depth, size = self._stats()
+        METRICS.set('outbox_depth', depth)
+        METRICS.set('outbox_bytes', size)
+        if sent or failed:
+            logging.info(f'Повторная отправка из outbox: доставлено {sent},'
+                         f' отложено {failed}.')
+        return sent, failed
+
+    def flush(self, send: Callable[[str, str], bool],
+              batch_size=OUTBOX_BATCH_SIZE):
+        """Разбирает очередь подряд, пока пачки отправляются целиком.
+
+        Возвращает число доставленных и отложенных уведомлений.
+        """
+        sent = failed = 0
+        while True:
+            batch_sent, batch_failed = self.drain(send, batch_size)
+            sent += batch_sent
+            failed += batch_failed
+            if (batch_sent, batch_failed) != (batch_size, 0):
+                return sent, failed
+
+    def prune(self, older_than=OUTBOX_KEEP_DELIVERED):
+        """Удаляет старые отметки о доставке и недоставленные письма."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM delivered WHERE delivered_at < ?',
+                               (time.time() - older_than,))
+            self.dead -= self._conn.execute(
+                'DELETE FROM dead WHERE died_at < ?',
+                (time.time() - older_than,)).rowcount
+        METRICS.set('outbox_dead', self.dead)
+
+    def start_worker(self, send: Callable[[str, str], bool],
+                     interval=OUTBOX_RETRY_INTERVAL):
+        """Запускает фоновый поток, разбирающий очередь неотправленного.
+
+        Возвращает событие, установка которого останавливает поток.
+        """
+        stopped = threading.Event()
+
+        def worker():
+            while not stopped.wait(interval):
+                try:
+                    # После сбоя Telegram очередь разбирается подряд
+                    self.flush(send)
+                except Exception as error:
+                    logging.error(f'Сбой при разборе outbox: {error}')
+
+        threading.Thread(target=worker, daemon=True).start()
+        return stopped
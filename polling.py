@@ -0,0 +1,32 @@
+import os
+
+from homework import RETRY_PERIOD
+
+POLL_MIN_INTERVAL: int = int(os.getenv('POLL_MIN_INTERVAL', 300))
+POLL_BASE_INTERVAL: int = RETRY_PERIOD
+POLL_MAX_INTERVAL: int = int(os.getenv('POLL_MAX_INTERVAL', 60 * 60))
+RECENT_ACTIVITY: int = 60 * 60
+IDLE_DOUBLING: int = 24 * 60 * 60
+APPROVED_FACTOR: int = 2
+
+
+def poll_interval(status, updated_at, now):
+    """Интервал до следующего опроса арендатора по его состоянию.
+
+    Недавние изменения опрашиваются чаще всего, работа на проверке —
+    раз в POLL_BASE_INTERVAL. Без изменений интервал удваивается
+    каждые IDLE_DOUBLING секунд простоя, а у принятой работы растёт
+    вдвое быстрее. Результат ограничен POLL_MIN_INTERVAL
+    и POLL_MAX_INTERVAL.
+    """
+    if not updated_at:
+        return POLL_BASE_INTERVAL
+    idle = max(now - updated_at, 0)
+    if idle < RECENT_ACTIVITY:
+        return POLL_MIN_INTERVAL
+    if status == 'reviewing':
+        return POLL_BASE_INTERVAL
+    interval = POLL_BASE_INTERVAL * 2 ** min(idle / IDLE_DOUBLING, 32)
+    if status == 'approved':
+        interval *= APPROVED_FACTOR
+    return int(min(max(interval, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL))
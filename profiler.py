@@ -0,0 +1,147 @@
+import argparse
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_CYCLES: int = int(os.getenv('PROFILE_CYCLES', 0))
+PROFILE_DIR: str = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SIGNAL_CYCLES: int = 10
+PROFILE_TOP: int = 25
+PROFILE_REQUEST: str = 'request'
+STAGES: tuple = ('get_api_answer', 'request_api', 'decode', 'record',
+                 'check_response', 'parse_status', 'send_message',
+                 'send_to_chat')
+
+
+class Profiler:
+    """Профилирование CPU и памяти на следующих N циклах опроса.
+
+    Пока профилирование не запрошено, cycle() ничего не делает.
+    cProfile видит только поток, в котором идёт цикл: отправки по
+    нескольким чатам в потоках Sender и фоновое обновление кэша в
+    разбивку по этапам не попадают.
+    """
+
+    def __init__(self, out_dir=PROFILE_DIR, cycles=PROFILE_CYCLES):
+        self.out_dir = out_dir
+        self.remaining = 0
+        self._stats = None
+        self._snapshot = None
+        self._lock = threading.RLock()
+        if cycles:
+            self.request(cycles)
+
+    def request(self, cycles):
+        """Включает профилирование на ближайшие cycles циклов."""
+        with self._lock:
+            if not self.remaining:
+                tracemalloc.start()
+                self._snapshot = tracemalloc.take_snapshot()
+            self.remaining = max(self.remaining, cycles)
+        logging.info(f'Профилирование включено на {cycles} циклов.')
+
+    def install_signal(self, signum=getattr(signal, 'SIGUSR1', None)):
+        """Включает профилирование по сигналу.
+
+        Число циклов берётся из файла запроса в каталоге профилей.
+        """
+        if signum is None:
+            return
+        signal.signal(signum, lambda *args: self.request(self._requested()))
+
+    @contextmanager
+    def cycle(self):
+        """Профилирует один цикл, если профилирование включено."""
+        if not self.remaining:
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Другой профилировщик уже активен в этом процессе
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._finish_cycle(profile)
+
+    def _finish_cycle(self, profile):
+        with self._lock:
+            if not self.remaining:
+                return
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.remaining -= 1
+            if self.remaining:
+                return
+            stats, self._stats = self._stats, None
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        self.dump(stats, snapshot)
+
+    def dump(self, stats, snapshot):
+        """Сохраняет профиль, разбивку по этапам и топ выделений памяти."""
+        os.makedirs(self.out_dir, exist_ok=True)
+        prefix = os.path.join(self.out_dir,
+                              time.strftime('profile-%Y%m%d-%H%M%S'))
+        stats.dump_stats(f'{prefix}.prof')
+
+        report = io.StringIO()
+        report.write('Этапы: вызовы, суммарное время, с\n')
+        for stage, (calls, cumulative) in stage_times(stats).items():
+            report.write(f'{stage:>16} {calls:8d} {cumulative:10.6f}\n')
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        report.write('Топ мест выделения памяти:\n')
+        for diff in snapshot.compare_to(self._snapshot,
+                                        'lineno')[:PROFILE_TOP]:
+            report.write(f'{diff}\n')
+        with open(f'{prefix}.txt', 'w', encoding='utf-8') as file:
+            file.write(report.getvalue())
+        logging.info(f'Профиль сохранён в {prefix}.prof и {prefix}.txt')
+
+    def _requested(self):
+        try:
+            with open(os.path.join(self.out_dir, PROFILE_REQUEST)) as file:
+                return int(file.read().strip() or PROFILE_SIGNAL_CYCLES)
+        except (OSError, ValueError):
+            return PROFILE_SIGNAL_CYCLES
+
+
+def stage_times(stats):
+    """Число вызовов и суммарное время этапов опроса по данным cProfile."""
+    times = dict.fromkeys(STAGES, (0, 0.0))
+    for (_, _, name), (_, calls, _, cumulative, _) in stats.stats.items():
+        if name in times:
+            total_calls, total_time = times[name]
+            times[name] = (total_calls + calls, total_time + cumulative)
+    return times
+
+
+def main():
+    """Запрос профилирования у запущенного бота."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('pid', type=int, help='PID процесса бота')
+    parser.add_argument('cycles', type=int, nargs='?',
+                        default=PROFILE_SIGNAL_CYCLES)
+    args = parser.parse_args()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, PROFILE_REQUEST), 'w') as file:
+        file.write(str(args.cycles))
+    os.kill(args.pid, signal.SIGUSR1)
+
+
+if __name__ == '__main__':
+    main()
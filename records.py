@@ -0,0 +1,94 @@
+import enum
+import json
+from collections import namedtuple
+
+import exceptions as ex
+from homework import HOMEWORK_VERDICTS, parse_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+Verdict = enum.Enum('Verdict',
+                    {status: status for status in HOMEWORK_VERDICTS},
+                    type=str)
+VERDICTS: dict = {verdict.value: verdict for verdict in Verdict}
+
+Answer = namedtuple('Answer', ('homeworks', 'current_date'))
+
+
+class HomeworkRecord:
+    """Работа из ответа API с уже проверенными полями."""
+
+    __slots__ = ('name', 'status', 'date_updated', 'updated_at')
+
+    def __init__(self, name, status, date_updated=None, updated_at=0):
+        self.name = name
+        self.status = status
+        self.date_updated = date_updated
+        self.updated_at = updated_at
+
+    @property
+    def key(self):
+        """Ключ идемпотентной доставки, как у homework.delivery_key."""
+        if self.date_updated:
+            return self.name, f'{self.status.value}@{self.date_updated}'
+        return self.name, self.status.value
+
+    @property
+    def message(self):
+        """Текст уведомления, как у homework.parse_status."""
+        return (f'Изменился статус проверки работы "{self.name}".'
+                f' {HOMEWORK_VERDICTS[self.status.value]}')
+
+    def __repr__(self):
+        return (f'HomeworkRecord({self.name!r}, {self.status.value!r},'
+                f' {self.date_updated!r})')
+
+
+def loads(content):
+    """Разбирает JSON через orjson, если он установлен, иначе через json."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode(content):
+    """Разбирает тело ответа API сразу в Answer с записями HomeworkRecord.
+
+    Проверки check_response и parse_status выполняются при разборе:
+    ответ не по документации вызывает исключение SchemaError.
+    """
+    payload = loads(content)
+    if not isinstance(payload, dict):
+        raise ex.InvalidResponseType(f'Ответ API приходит не в ожидаемом'
+                                     f' виде. Получен {type(payload)},'
+                                     f' а ожидался dict.')
+    try:
+        homeworks = payload['homeworks']
+        current_date = payload['current_date']
+    except KeyError as error:
+        raise ex.MissingResponseKey(f'В ответе API нет ключа {error}.')
+    if not isinstance(homeworks, list):
+        raise ex.InvalidResponseType(f'Ответ API под ключом "homeworks"'
+                                     f' приходит не в ожидаемом виде.'
+                                     f' Получен {type(homeworks)},'
+                                     f' а ожидался list.')
+    return Answer(tuple(map(record, homeworks)), current_date)
+
+
+def record(homework):
+    """Собирает HomeworkRecord из словаря работы."""
+    try:
+        name = homework['homework_name']
+        status = VERDICTS[homework['status']]
+    except KeyError as error:
+        if 'homework_name' in homework and 'status' in homework:
+            raise ex.APIReturningUnknownArgument(
+                'API возвращает незадокументированный аргумент'
+                f' {homework["status"]}')
+        raise ex.MissingResponseKey(f'В работе нет ключа {error}.')
+    date_updated = homework.get('date_updated')
+    return HomeworkRecord(name, status, date_updated,
+                          parse_date(date_updated))
@@ -0,0 +1,67 @@
+import logging
+import os
+import random
+import threading
+
+import exceptions as ex
+from metrics import METRICS
+
+RETRY_ATTEMPTS: int = int(os.getenv('RETRY_ATTEMPTS', 3))
+RETRY_BASE_DELAY: float = 1
+RETRY_MAX_DELAY: float = 30
+
+TRANSIENT: str = 'transient'
+RETRY_AFTER: str = 'retry_after'
+PERMANENT: str = 'permanent'
+
+
+def classify(error):
+    """Класс сбоя: временный, с паузой Retry-After, постоянный или None."""
+    if isinstance(error, ex.TooManyRequests):
+        return RETRY_AFTER
+    if isinstance(error, ex.PermanentError):
+        return PERMANENT
+    if isinstance(error, ex.TransientError):
+        return TRANSIENT
+    return None
+
+
+class RetryPolicy:
+    """Повторы временных сбоев внутри одного цикла опроса.
+
+    Между попытками выдерживается base, 2·base, ... секунд, но не больше
+    cap, со случайным разбросом в пределах половины задержки, чтобы после
+    общего сбоя арендаторы не повторяли запросы одновременно. Остальные
+    сбои пробрасываются сразу.
+    """
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, base=RETRY_BASE_DELAY,
+                 cap=RETRY_MAX_DELAY, wait=None):
+        self.attempts = max(attempts, 1)
+        self.base = base
+        self.cap = cap
+        self.wait = wait or threading.Event().wait
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt):
+        """Задержка перед повтором номер attempt, начиная с нуля."""
+        delay = min(self.cap, self.base * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def call(self, func, *args):
+        """Вызывает func, повторяя её при временных сбоях."""
+        for attempt in range(self.attempts):
+            try:
+                return func(*args)
+            except Exception as error:
+                if (classify(error) != TRANSIENT
+                        or attempt + 1 == self.attempts):
+                    raise
+                delay = self.delay(attempt)
+                logging.warning(f'Временный сбой: {error!r}, повтор через'
+                                f' {delay:.1f} с.')
+                with self._lock:
+                    self.retries += 1
+                    METRICS.set('retries', self.retries)
+                self.wait(delay)
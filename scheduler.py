@@ -0,0 +1,91 @@
+import heapq
+import itertools
+import time
+
+
+class Scheduler:
+    """Очередь опросов арендаторов, упорядоченная по времени опроса.
+
+    Перепланирование и отмена стоят O(log n): старые записи в куче
+    не удаляются, а пропускаются при извлечении. У опроса, перенесённого
+    на потом, запоминается время, к которому он был положен изначально:
+    с него опрос и считается просроченным.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap: list = []
+        self._due: dict = {}
+        self._since: dict = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, tenant_id):
+        return tenant_id in self._due
+
+    def schedule(self, tenant_id, delay=0, since=None):
+        """Планирует опрос арендатора через delay секунд.
+
+        since — изначальное время опроса, если он переносится.
+        """
+        due = self.clock() + delay
+        self._due[tenant_id] = due
+        if since is None:
+            self._since.pop(tenant_id, None)
+        else:
+            self._since[tenant_id] = since
+        heapq.heappush(self._heap, (due, next(self._counter), tenant_id))
+
+    def cancel(self, tenant_id):
+        """Снимает арендатора с расписания."""
+        self._due.pop(tenant_id, None)
+        self._since.pop(tenant_id, None)
+
+    def due_at(self, tenant_id):
+        """Время запланированного опроса арендатора."""
+        return self._due.get(tenant_id)
+
+    def pop_due(self, now=None):
+        """Извлекает арендаторов, время опроса которых наступило.
+
+        Возвращает пары (арендатор, изначальное время опроса).
+        """
+        now = self.clock() if now is None else now
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, tenant_id = heapq.heappop(self._heap)
+            if self._due.get(tenant_id) == due:
+                del self._due[tenant_id]
+                ready.append((tenant_id, self._since.pop(tenant_id, due)))
+        return ready
+
+    def overdue(self, before):
+        """Число арендаторов, опрос которых положен раньше before.
+
+        Обходит только верх кучи: у потомков записи время не меньше.
+        """
+        count = sum(since < before for since in self._since.values())
+        stack = [0] if self._heap else []
+        while stack:
+            index = stack.pop()
+            due, _, tenant_id = self._heap[index]
+            if due >= before:
+                continue
+            if (self._due.get(tenant_id) == due
+                    and tenant_id not in self._since):
+                count += 1
+            stack.extend(child for child in (2 * index + 1, 2 * index + 2)
+                         if child < len(self._heap))
+        return count
+
+    def next_due(self, now=None):
+        """Секунды до ближайшего опроса или None, если расписание пусто."""
+        now = self.clock() if now is None else now
+        while self._heap:
+            due, _, tenant_id = self._heap[0]
+            if self._due.get(tenant_id) == due:
+                return max(due - now, 0)
+            heapq.heappop(self._heap)
+        return None
@@ -0,0 +1,52 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from outbox import PRIORITY_STATUS
+
+SENDER_THREADS: int = int(os.getenv('SENDER_THREADS', 8))
+
+
+class Sender:
+    """Параллельная отправка уведомлений через outbox.
+
+    send(chat_id, text) отправляет одно сообщение и сообщает об успехе,
+    доставка в каждый чат учитывается в outbox отдельно.
+    """
+
+    def __init__(self, send: Callable[[str, str], bool], outbox,
+                 threads=SENDER_THREADS):
+        self.send_to_chat = send
+        self.outbox = outbox
+        self.pool = ThreadPoolExecutor(threads,
+                                       thread_name_prefix='sender')
+
+    def send(self, chat_id, key, message, changed_at=None, cohort='',
+             priority=PRIORITY_STATUS):
+        """Отправляет уведомление в один чат."""
+        return self.outbox.send(chat_id, *key, message, self.send_to_chat,
+                                changed_at, cohort, priority)
+
+    def fan_out(self, chat_ids, key, message, changed_at=None, cohort=''):
+        """Рассылает одно уведомление по всем чатам параллельно.
+
+        Возвращает результат отправки по каждому чату: True, False
+        или None, если в этот чат уведомление уже доставлялось.
+        """
+        if len(chat_ids) == 1:
+            return {chat_ids[0]: self.send(chat_ids[0], key, message,
+                                           changed_at, cohort)}
+        futures = {
+            chat_id: self.pool.submit(self.send, chat_id, key, message,
+                                      changed_at, cohort)
+            for chat_id in chat_ids
+        }
+        results = {chat_id: future.result()
+                   for chat_id, future in futures.items()}
+        failed = [chat_id for chat_id, sent in results.items()
+                  if sent is False]
+        if failed:
+            logging.error(f'Уведомление не доставлено в чаты {failed},'
+                          ' повтор через outbox.')
+        return results
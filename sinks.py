@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import requests
+
+from metrics import METRICS
+
+SINKS: str = os.getenv('SINKS', '')
+SINK_BATCH_SIZE: int = int(os.getenv('SINK_BATCH_SIZE', 100))
+SINK_FLUSH_INTERVAL: float = float(os.getenv('SINK_FLUSH_INTERVAL', 1))
+SINK_QUEUE_SIZE: int = 10000
+SINK_TIMEOUT: int = 10
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS transitions (
+    tenant_id TEXT NOT NULL,
+    cohort TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    changed_at INTEGER NOT NULL,
+    detected_at REAL NOT NULL
+);
+'''
+
+Transition = namedtuple('Transition', ('tenant_id', 'cohort', 'homework',
+                                       'status', 'changed_at',
+                                       'detected_at'))
+
+
+class NdjsonSink:
+    """Дописывает события в файл по одному JSON на строку."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, events):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.writelines(json.dumps(event._asdict(), ensure_ascii=False)
+                            + '\n' for event in events)
+
+
+class WebhookSink:
+    """Отправляет пачку событий JSON-массивом одним POST-запросом."""
+
+    def __init__(self, url, timeout=SINK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def write(self, events):
+        response = requests.post(
+            self.url, json=[event._asdict() for event in events],
+            timeout=self.timeout)
+        response.raise_for_status()
+
+
+class SqliteSink:
+    """Складывает события в таблицу transitions."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def write(self, events):
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO transitions VALUES (?, ?, ?, ?, ?, ?)', events)
+
+
+SINK_TYPES: dict = {
+    'ndjson': NdjsonSink,
+    'webhook': WebhookSink,
+    'sqlite': SqliteSink,
+}
+
+
+class SinkStats:
+    """Показатели одного приёмника событий."""
+
+    __slots__ = ('written', 'batches', 'dropped', 'failed', 'lag',
+                 'write_time')
+
+    def __init__(self):
+        self.written = self.batches = self.dropped = self.failed = 0
+        self.lag = self.write_time = 0.0
+
+    def as_dict(self):
+        return {
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'lag': round(self.lag, 3),
+            'throughput': (round(self.written / self.write_time)
+                           if self.write_time else None),
+        }
+
+
+class SinkPipeline:
+    """Асинхронная пакетная запись событий смены статуса в приёмники.
+
+    У каждого приёмника своя ограниченная очередь и поток. emit() не
+    блокирует: при переполненной очереди событие для этого приёмника
+    отбрасывается и учитывается в dropped. Поток пишет пачку, когда
+    набралось batch_size событий или прошло flush_interval секунд с
+    первого из них.
+    """
+
+    def __init__(self, sinks, batch_size=SINK_BATCH_SIZE,
+                 flush_interval=SINK_FLUSH_INTERVAL,
+                 queue_size=SINK_QUEUE_SIZE):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {name: SinkStats() for name in sinks}
+        self._queues = {name: queue.Queue(queue_size) for name in sinks}
+        self._threads = [
+            threading.Thread(target=self._run, args=(name,), daemon=True,
+                             name=f'sink-{name}')
+            for name in sinks
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def emit(self, event):
+        """Ставит событие в очереди всех приёмников."""
+        for name, events in self._queues.items():
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                self.stats[name].dropped += 1
+
+    def close(self):
+        """Дописывает накопленные события и останавливает потоки."""
+        for events in self._queues.values():
+            events.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, name):
+        events = self._queues[name]
+        closed = False
+        while not closed:
+            batch = [events.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(events.get(
+                        timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                closed = True
+                batch.pop()
+            if batch:
+                self._write(name, batch)
+
+    def _write(self, name, batch):
+        stats = self.stats[name]
+        started = time.monotonic()
+        try:
+            self.sinks[name].write(batch)
+        except Exception as error:
+            stats.failed += len(batch)
+            logging.error(f'Сбой записи событий в {name}: {error}')
+        else:
+            stats.written += len(batch)
+            stats.batches += 1
+            stats.lag = time.time() - batch[0].detected_at
+        stats.write_time += time.monotonic() - started
+        METRICS.set('sinks', {sink: self.stats[sink].as_dict()
+                              for sink in self.sinks})
+
+
+def from_config(spec=SINKS, **kwargs):
+    """Собирает конвейер из строки вида "ndjson:path,webhook:url".
+
+    Возвращает None, если приёмники не заданы.
+    """
+    sinks = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, target = item.partition(':')
+        if kind not in SINK_TYPES or not target:
+            raise ValueError(f'Неизвестный приёмник событий: {item}')
+        name = kind if kind not in sinks else f'{kind}{len(sinks)}'
+        sinks[name] = SINK_TYPES[kind](target)
+    return SinkPipeline(sinks, **kwargs) if sinks else None
@@ -0,0 +1,163 @@
+import argparse
+import sqlite3
+from collections import namedtuple
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS tenants (
+    tenant_id TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    cohort TEXT NOT NULL DEFAULT '',
+    subscribers TEXT NOT NULL DEFAULT '',
+    revision INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tenants_revision ON tenants (revision);
+CREATE TABLE IF NOT EXISTS tenant_state (
+    tenant_id TEXT PRIMARY KEY,
+    cursor INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    updated_at INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    parked INTEGER NOT NULL DEFAULT 0
+);
+'''
+
+NEXT_REVISION: str = '(SELECT COALESCE(MAX(revision), 0) + 1 FROM tenants)'
+
+TenantChange = namedtuple('TenantChange', ('tenant_id', 'token', 'chat_id',
+                                           'cohort', 'subscribers',
+                                           'deleted'))
+
+
+class TenantConfig:
+    """Конфигурация арендаторов в SQLite с номером ревизии у каждой строки.
+
+    Каждое изменение получает новую ревизию, удаление оставляет
+    отметку deleted, поэтому changes() читает только строки,
+    изменившиеся с прошлого вызова.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.revision = 0
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def upsert(self, tenant_id, token, chat_id, cohort='', subscribers=None):
+        """Добавляет арендатора или меняет его настройки.
+
+        subscribers — дополнительные чаты, получающие уведомления
+        арендатора: ментор, чат когорты. None оставляет подписчиков
+        существующего арендатора без изменений. Остановленный из-за
+        постоянной ошибки арендатор снова начинает опрашиваться.
+        """
+        keep = subscribers is None
+        with self._conn:
+            self._conn.execute(
+                'UPDATE tenant_state SET parked = 0 WHERE tenant_id = ?',
+                (str(tenant_id),))
+            self._conn.execute(
+                'INSERT INTO tenants'
+                ' (tenant_id, token, chat_id, cohort, subscribers, revision)'
+                f' VALUES (?, ?, ?, ?, ?, {NEXT_REVISION})'
+                ' ON CONFLICT (tenant_id) DO UPDATE SET'
+                ' token = excluded.token, chat_id = excluded.chat_id,'
+                ' cohort = excluded.cohort,'
+                ' subscribers = CASE WHEN ? THEN subscribers'
+                ' ELSE excluded.subscribers END,'
+                ' revision = excluded.revision, deleted = 0',
+                (str(tenant_id), token, str(chat_id), cohort,
+                 ' '.join(map(str, subscribers or ())), keep))
+
+    def subscribe(self, tenant_id, chat_id, subscribed=True):
+        """Добавляет чат в подписчики арендатора или убирает его."""
+        with self._conn:
+            row = self._conn.execute(
+                'SELECT subscribers FROM tenants WHERE tenant_id = ?',
+                (str(tenant_id),)).fetchone()
+            if row is None:
+                raise KeyError(f'Арендатор {tenant_id} не найден.')
+            subscribers = [chat for chat in row[0].split()
+                           if chat != str(chat_id)]
+            if subscribed:
+                subscribers.append(str(chat_id))
+            self._conn.execute(
+                'UPDATE tenants SET subscribers = ?,'
+                f' revision = {NEXT_REVISION} WHERE tenant_id = ?',
+                (' '.join(subscribers), str(tenant_id)))
+
+    def delete(self, tenant_id):
+        """Помечает арендатора удалённым."""
+        with self._conn:
+            self._conn.execute(
+                f'UPDATE tenants SET deleted = 1, revision = {NEXT_REVISION}'
+                ' WHERE tenant_id = ?', (str(tenant_id),))
+
+    def changes(self):
+        """Список TenantChange, изменившихся с прошлого вызова."""
+        rows = self._conn.execute(
+            'SELECT tenant_id, token, chat_id, cohort, subscribers, deleted,'
+            ' revision FROM tenants WHERE revision > ? ORDER BY revision',
+            (self.revision,)).fetchall()
+        if rows:
+            self.revision = rows[-1][-1]
+        return [
+            TenantChange(tenant_id, token, chat_id, cohort,
+                         tuple(subscribers.split()), bool(deleted))
+            for tenant_id, token, chat_id, cohort, subscribers, deleted, _
+            in rows
+        ]
+
+    def load_state(self):
+        """Сохранённое состояние опроса арендаторов.
+
+        Возвращает строки (tenant_id, cursor, status, updated_at, errors,
+        parked) для неудалённых арендаторов.
+        """
+        return self._conn.execute(
+            'SELECT tenant_id, cursor, status, updated_at, errors, parked'
+            ' FROM tenant_state JOIN tenants USING (tenant_id)'
+            ' WHERE NOT deleted').fetchall()
+
+    def save_state(self, rows):
+        """Сохраняет курсоры и статусы арендаторов между запусками."""
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO tenant_state'
+                ' (tenant_id, cursor, status, updated_at, errors, parked)'
+                ' VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+
+def main():
+    """Правка конфигурации арендаторов из командной строки."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('path', help='путь к базе арендаторов')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='добавить или изменить арендатора')
+    add.add_argument('tenant_id')
+    add.add_argument('token')
+    add.add_argument('chat_id')
+    add.add_argument('cohort', nargs='?', default='')
+    remove = commands.add_parser('remove', help='удалить арендатора')
+    remove.add_argument('tenant_id')
+    for command in ('subscribe', 'unsubscribe'):
+        subscription = commands.add_parser(
+            command, help='подписать чат на уведомления арендатора'
+            if command == 'subscribe' else 'отписать чат')
+        subscription.add_argument('tenant_id')
+        subscription.add_argument('chat_id')
+    args = parser.parse_args()
+
+    config = TenantConfig(args.path)
+    if args.command == 'add':
+        config.upsert(args.tenant_id, args.token, args.chat_id, args.cohort)
+    elif args.command == 'remove':
+        config.delete(args.tenant_id)
+    else:
+        config.subscribe(args.tenant_id, args.chat_id,
+                         args.command == 'subscribe')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import sys
+from array import array
+from typing import Iterator, Optional
+
+from homework import HOMEWORK_VERDICTS
+
+STATUSES: tuple = ('',) + tuple(sys.intern(key) for key in HOMEWORK_VERDICTS)
+STATUS_CODES: dict = {status: code for code, status in enumerate(STATUSES)}
+
+
+def parse_chat_id(chat_id):
+    """Числовой id чата приводит к int, имя вида @channel оставляет."""
+    try:
+        return int(chat_id)
+    except ValueError:
+        return str(chat_id)
+
+
+class Tenant:
+    """Состояние одного арендатора: токен, чат, курсор, статус, ошибки."""
+
+    __slots__ = ('tenant_id', 'token', 'chat_id', 'cohort', 'subscribers',
+                 'cursor', 'status', 'updated_at', 'errors')
+
+    def __init__(self, tenant_id, token, chat_id, cohort='', subscribers=(),
+                 cursor=0, status='', updated_at=0, errors=0):
+        self.tenant_id = tenant_id
+        self.token = token
+        self.chat_id = chat_id
+        self.cohort = cohort
+        self.subscribers = subscribers
+        self.cursor = cursor
+        self.status = status
+        self.updated_at = updated_at
+        self.errors = errors
+
+    @property
+    def recipients(self):
+        """Все чаты, получающие уведомления арендатора."""
+        return (self.chat_id,) + self.subscribers
+
+    def __repr__(self):
+        return f'Tenant({self.tenant_id!r}, status={self.status!r})'
+
+
+class TenantTable:
+    """Состояние множества арендаторов, разложенное по колонкам array.
+
+    Статусы хранятся кодами из STATUS_CODES, когорты — общими
+    интернированными строками, собственная строка у арендатора
+    только одна — токен. У арендаторов без подписчиков колонка
+    subscribers ссылается на общий пустой кортеж. Чаты вида @channel
+    не помещаются в chat_ids и хранятся в словаре chat_names по номеру
+    строки. Строки удалённых арендаторов переиспользуются. В dirty
+    копятся арендаторы, состояние опроса которых изменилось с последнего
+    сохранения.
+    """
+
+    def __init__(self):
+        self._rows: dict = {}
+        self._free: list = []
+        self.tenant_ids: list = []
+        self.tokens: list = []
+        self.cohorts: list = []
+        self.subscribers: list = []
+        self.chat_ids = array('q')
+        self.chat_names: dict = {}
+        self.cursors = array('q')
+        self.updated = array('q')
+        self.statuses = array('B')
+        self.errors = array('H')
+        self.dirty: set = set()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, tenant_id):
+        return tenant_id in self._rows
+
+    def __iter__(self) -> Iterator:
+        return iter(self._rows)
+
+    def add(self, tenant_id, token, chat_id, cursor=0, cohort='',
+            subscribers=()):
+        """Добавляет арендатора или обновляет его токен, чаты и когорту."""
+        cohort = sys.intern(cohort)
+        subscribers = tuple(map(parse_chat_id, subscribers))
+        chat_id = parse_chat_id(chat_id)
+        row = self._rows.get(tenant_id)
+        # Чат записывается первым: слишком большой id отклоняется
+        # до изменения остальных колонок
+        if row is not None:
+            self._set_chat(row, chat_id)
+            self.tokens[row] = token
+            self.cohorts[row] = cohort
+            self.subscribers[row] = subscribers
+            return row
+        if self._free:
+            row = self._free[-1]
+            self._set_chat(row, chat_id)
+            self._free.pop()
+            self.tenant_ids[row] = tenant_id
+            self.tokens[row] = token
+            self.cohorts[row] = cohort
+            self.subscribers[row] = subscribers
+            self.cursors[row] = cursor
+            self.updated[row] = self.statuses[row] = self.errors[row] = 0
+        else:
+            row = len(self.tenant_ids)
+            self.chat_ids.append(chat_id if isinstance(chat_id, int) else 0)
+            self._set_chat(row, chat_id)
+            self.tenant_ids.append(tenant_id)
+            self.tokens.append(token)
+            self.cohorts.append(cohort)
+            self.subscribers.append(subscribers)
+            self.cursors.append(cursor)
+            self.updated.append(0)
+            self.statuses.append(0)
+            self.errors.append(0)
+        self._rows[tenant_id] = row
+        self.dirty.add(tenant_id)
+        return row
+
+    def remove(self, tenant_id):
+        """Удаляет арендатора, освобождая его строку."""
+        row = self._rows.pop(tenant_id)
+        self.tenant_ids[row] = self.tokens[row] = None
+        self.subscribers[row] = ()
+        self.chat_names.pop(row, None)
+        self._free.append(row)
+        self.dirty.discard(tenant_id)
+
+    def _set_chat(self, row, chat_id):
+        if isinstance(chat_id, int):
+            self.chat_ids[row] = chat_id
+            self.chat_names.pop(row, None)
+        else:
+            self.chat_ids[row] = 0
+            self.chat_names[row] = chat_id
+
+    def get(self, tenant_id) -> Optional[Tenant]:
+        """Собирает запись Tenant по строке таблицы."""
+        row = self._rows.get(tenant_id)
+        if row is None:
+            return None
+        chat_id = self.chat_names.get(row, self.chat_ids[row])
+        return Tenant(tenant_id, self.tokens[row], chat_id,
+                      self.cohorts[row], self.subscribers[row],
+                      self.cursors[row],
+                      STATUSES[self.statuses[row]], self.updated[row],
+                      self.errors[row])
+
+    def status(self, tenant_id):
+        """Последний известный статус работы арендатора."""
+        return STATUSES[self.statuses[self._rows[tenant_id]]]
+
+    def set_status(self, tenant_id, status, updated_at=0):
+        """Запоминает статус и сообщает, изменился ли он."""
+        row = self._rows[tenant_id]
+        code = STATUS_CODES[status]
+        changed = (self.statuses[row], self.updated[row]) != (code,
+                                                              updated_at)
+        self.statuses[row] = code
+        self.updated[row] = updated_at
+        if changed:
+            self.dirty.add(tenant_id)
+        return changed
+
+    def set_cursor(self, tenant_id, cursor):
+        """Сдвигает курсор from_date арендатора."""
+        row = self._rows[tenant_id]
+        if self.cursors[row] != cursor:
+            self.cursors[row] = cursor
+            self.dirty.add(tenant_id)
+
+    def restore(self, tenant_id, cursor, status, updated_at, errors):
+        """Восстанавливает сохранённое состояние опроса арендатора."""
+        row = self._rows[tenant_id]
+        self.cursors[row] = cursor
+        self.statuses[row] = STATUS_CODES[status]
+        self.updated[row] = updated_at
+        self.errors[row] = min(errors, 0xFFFF)
+        self.dirty.discard(tenant_id)
+
+    def record_error(self, tenant_id, failed=True):
+        """Считает подряд идущие ошибки арендатора, сбрасывая при успехе."""
+        row = self._rows[tenant_id]
+        errors = min(self.errors[row] + 1, 0xFFFF) if failed else 0
+        if errors != self.errors[row]:
+            self.errors[row] = errors
+            self.dirty.add(tenant_id)
+        return errors
@@ -0,0 +1,77 @@
+"""Скорость разбора и проверки ответа API: словари против записей.
+
+Запуск из корня репозитория: python -m tests.bench_decode
+"""
+import json
+import time
+
+import homework
+import records
+
+SIZES: tuple = (1_000, 100_000)
+STATUSES: tuple = tuple(homework.HOMEWORK_VERDICTS)
+REPEATS: int = 3
+
+
+def make_payload(size):
+    return json.dumps({
+        'homeworks': [
+            {'id': number, 'homework_name': f'student_{number}__hw05.zip',
+             'status': STATUSES[number % len(STATUSES)],
+             'reviewer_comment': 'Замечаний нет.' * (number % 3),
+             'date_updated': '2020-02-13T14:40:57Z',
+             'lesson_name': 'Итоговый проект'}
+            for number in range(size)
+        ],
+        'current_date': 1581604970,
+    }).encode()
+
+
+def decode_dicts(content):
+    """Текущий путь: json, check_response и parse_status по словарям."""
+    answer = json.loads(content)
+    homework.check_response(answer)
+    return [
+        (homework.delivery_key(item), homework.parse_status(item),
+         item['status'], homework.parse_date(item.get('date_updated')))
+        for item in answer['homeworks']
+    ]
+
+
+def decode_records(content):
+    """Разбор сразу в записи HomeworkRecord."""
+    return [
+        (record.key, record.message, record.status.value, record.updated_at)
+        for record in records.decode(content).homeworks
+    ]
+
+
+def measure(decode, content):
+    best = float('inf')
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        decode(content)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    orjson = records.orjson
+    for size in SIZES:
+        content = make_payload(size)
+        assert decode_dicts(content) == decode_records(content)
+        baseline = measure(decode_dicts, content)
+        print(f'{size:>7} работ, словари: {size / baseline:10.0f} работ/с')
+        for name, module in (('записи, json', None),
+                             ('записи, orjson', orjson)):
+            if name.endswith('orjson') and module is None:
+                continue
+            records.orjson = module
+            elapsed = measure(decode_records, content)
+            print(f'{size:>7} работ, {name}: {size / elapsed:10.0f} работ/с,'
+                  f' ускорение x{baseline / elapsed:.1f}')
+        records.orjson = orjson
+
+
+if __name__ == '__main__':
+    main()
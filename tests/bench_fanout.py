@@ -0,0 +1,37 @@
+"""Пропускная способность рассылки одного уведомления по многим чатам.
+
+Запуск из корня репозитория: python -m tests.bench_fanout
+"""
+import time
+
+from outbox import Outbox
+from sender import Sender
+
+SEND_LATENCY: float = 0.02
+RECIPIENTS: tuple = (1, 3, 10, 50)
+
+
+def slow_send(chat_id, text):
+    time.sleep(SEND_LATENCY)
+    return True
+
+
+def measure(recipients, threads):
+    sender = Sender(slow_send, Outbox(':memory:'), threads=threads)
+    chat_ids = tuple(str(chat_id) for chat_id in range(recipients))
+    start = time.perf_counter()
+    sender.fan_out(chat_ids, ('hw123', 'approved'), 'text')
+    return recipients / (time.perf_counter() - start)
+
+
+def main():
+    print(f'Задержка отправки одного сообщения: {SEND_LATENCY * 1000:.0f} мс')
+    for recipients in RECIPIENTS:
+        sequential = measure(recipients, threads=1)
+        concurrent = measure(recipients, threads=8)
+        print(f'{recipients:>4} чатов: последовательно {sequential:7.1f}'
+              f' сообщ./с, параллельно {concurrent:7.1f} сообщ./с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Микробенчмарки функций бота с сохранённым базовым замером.
+
+Каждая функция прогоняется на ответах API с 0, 10, 1 000 и 100 000
+работ. Замеры сравниваются с базовыми из BASELINE_PATH, статистически
+значимое замедление помечается, а код выхода становится 1.
+
+Запуск из корня репозитория:
+    python -m tests.bench_functions --save   # сохранить базовый замер
+    python -m tests.bench_functions          # сравнить с ним
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+
+import requests
+
+import homework
+from tests.utils import MockTelegramBot
+
+SIZES: tuple = (0, 10, 1_000, 100_000)
+SAMPLES: int = 10
+MIN_SAMPLE_TIME: float = 0.01
+BASELINE_PATH: str = 'bench_baseline.json'
+REGRESSION_THRESHOLD: float = 0.1
+# Критические значения t-распределения для одностороннего alpha = 0.01
+T_CRITICAL: tuple = ((1, 31.82), (2, 6.965), (3, 4.541), (4, 3.747),
+                     (5, 3.365), (6, 3.143), (7, 2.998), (8, 2.896),
+                     (9, 2.821), (10, 2.764), (12, 2.681), (15, 2.602),
+                     (20, 2.528), (30, 2.457), (60, 2.390))
+T_CRITICAL_LIMIT: float = 2.326
+
+
+class StubResponse:
+    """Ответ API без сети: JSON разбирается из заранее собранного тела."""
+
+    status_code = 200
+
+    def __init__(self, body):
+        self.content = body
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def make_answer(size):
+    statuses = tuple(homework.HOMEWORK_VERDICTS)
+    return {
+        'homeworks': [
+            {'id': number, 'homework_name': f'student_{number}__hw05.zip',
+             'status': statuses[number % len(statuses)],
+             'reviewer_comment': 'Замечаний нет.',
+             'date_updated': '2020-02-13T14:40:57Z',
+             'lesson_name': 'Итоговый проект'}
+            for number in range(size)
+        ],
+        'current_date': 1581604970,
+    }
+
+
+def make_cases(size):
+    """Функции для замера: имя и вызов без аргументов."""
+    answer = make_answer(size)
+    body = json.dumps(answer).encode()
+    messages = [homework.parse_status(item) for item in answer['homeworks']]
+    bot = MockTelegramBot()
+
+    def get_api_answer():
+        requests.get = lambda *args, **kwargs: StubResponse(body)
+        homework.get_api_answer(0)
+
+    def parse_status():
+        for item in answer['homeworks']:
+            homework.parse_status(item)
+
+    def send_message():
+        for message in messages:
+            homework.send_message(bot, message)
+
+    return {
+        'check_response': lambda: homework.check_response(answer),
+        'parse_status': parse_status,
+        'get_api_answer': get_api_answer,
+        'send_message': send_message,
+    }
+
+
+def calibrate(func):
+    """Число вызовов на замер, чтобы он длился не меньше MIN_SAMPLE_TIME."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - started >= MIN_SAMPLE_TIME:
+            return loops
+        loops *= 2
+
+
+def sample(func, loops):
+    """Время одного вызова func, усреднённое по loops вызовам."""
+    started = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - started) / loops
+
+
+def t_critical(df):
+    for limit, value in T_CRITICAL:
+        if df <= limit:
+            return value
+    return T_CRITICAL_LIMIT
+
+
+def is_regression(baseline, current):
+    """Значимое замедление по t-критерию Уэлча и порогу в 10%.
+
+    Возвращает относительное изменение среднего и признак регрессии.
+    """
+    base_mean = statistics.mean(baseline)
+    mean = statistics.mean(current)
+    change = mean / base_mean - 1
+    base_var = statistics.variance(baseline) / len(baseline)
+    var = statistics.variance(current) / len(current)
+    if not base_var + var:
+        return change, change > REGRESSION_THRESHOLD
+    t = (mean - base_mean) / math.sqrt(base_var + var)
+    df = (base_var + var) ** 2 / (
+        base_var ** 2 / (len(baseline) - 1) + var ** 2 / (len(current) - 1))
+    return change, (change > REGRESSION_THRESHOLD
+                    and t > t_critical(math.floor(df)))
+
+
+def run():
+    """SAMPLES замеров каждой функции на каждом размере ответа.
+
+    Замеры идут по кругу через все функции, чтобы дрейф частоты
+    процессора за время прогона одинаково сказывался на каждой.
+    """
+    original_get = requests.get
+    try:
+        cases = {
+            f'{name}[{size}]': func
+            for size in SIZES for name, func in make_cases(size).items()
+        }
+        loops = {name: calibrate(func) for name, func in cases.items()}
+        results = {name: [] for name in cases}
+        for _ in range(SAMPLES):
+            for name, func in cases.items():
+                results[name].append(sample(func, loops[name]))
+    finally:
+        requests.get = original_get
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Микробенчмарки функций.')
+    parser.add_argument('--save', action='store_true',
+                        help='сохранить замеры как базовые')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='путь к файлу с базовыми замерами')
+    args = parser.parse_args()
+
+    results = run()
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = {}
+
+    regressions = 0
+    for name, samples in results.items():
+        line = f'{name:>24}: {statistics.median(samples) * 1e6:12.1f} мкс'
+        if name in baseline and not args.save:
+            change, regressed = is_regression(baseline[name], samples)
+            line += f' {change:+7.1%}'
+            if regressed:
+                line += '  ЗАМЕДЛЕНИЕ'
+                regressions += 1
+        print(line)
+    if regressions:
+        print(f'Значимых замедлений: {regressions}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
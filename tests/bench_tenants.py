@@ -0,0 +1,69 @@
+"""Замер памяти на одного арендатора.
+
+Запуск из корня репозитория: python -m tests.bench_tenants
+"""
+import gc
+import tracemalloc
+
+from tenants import STATUSES, Tenant, TenantTable
+
+SIZES: tuple = (10_000, 100_000)
+
+
+def make_token(number):
+    return f'y0_AgAAAAA{number:040d}'
+
+
+def build_dicts(size):
+    return {
+        str(number): {
+            'token': make_token(number),
+            'chat_id': str(100_000_000 + number),
+            'cursor': str(1_650_000_000 + number),
+            'status': STATUSES[number % len(STATUSES)],
+            'error': '',
+        }
+        for number in range(size)
+    }
+
+
+def build_records(size):
+    return {
+        number: Tenant(number, make_token(number), 100_000_000 + number,
+                       '', (), 1_650_000_000 + number,
+                       STATUSES[number % len(STATUSES)])
+        for number in range(size)
+    }
+
+
+def build_table(size):
+    table = TenantTable()
+    for number in range(size):
+        table.add(number, make_token(number), 100_000_000 + number,
+                  1_650_000_000 + number)
+        table.set_status(number, STATUSES[number % len(STATUSES)])
+    return table
+
+
+def measure(build, size):
+    gc.collect()
+    tracemalloc.start()
+    state = build(size)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del state
+    return used / size
+
+
+def main():
+    for size in SIZES:
+        for name, build in (('dict', build_dicts),
+                            ('slots', build_records),
+                            ('columns', build_table)):
+            print(f'{name:>8} {size:>7}: {measure(build, size):8.1f}'
+                  ' байт на арендатора')
+
+
+if __name__ == '__main__':
+    main()
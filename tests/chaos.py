@@ -0,0 +1,304 @@
+"""Опрос под внедрёнными сбоями API Практикума и Telegram.
+
+Поднимает локальные заглушки обоих сервисов, запускает worker.py на
+ускоренном расписании и по плану включает сбои: задержки ответа, серии
+5xx, 429, обрезанный JSON, сбросы соединения и недоступность Telegram.
+Отчёт: время восстановления после каждого сбоя, запросы впустую за
+время сбоя, дубли и потери уведомлений, прирост памяти.
+
+Запуск из корня репозитория: python -m tests.chaos
+"""
+import collections
+import json
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+import tracemalloc
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import telegram
+
+import homework as hw
+import outbox
+import worker
+from governor import Governor
+from outbox import Outbox
+from retry import RetryPolicy
+from tenant_config import TenantConfig
+
+TENANTS: int = 20
+TICK: float = 0.25
+DURATION: float = 30
+SETTLE: float = 5
+REQUEST_TIMEOUT: float = 1
+SEED: int = 41
+# (начало, конец, сбой) в секундах от запуска
+FAULTS: tuple = (
+    (2, 5, 'server_error'),
+    (7, 9, 'latency'),
+    (11, 13, 'rate_limit'),
+    (15, 17, 'malformed'),
+    (19, 21, 'reset'),
+    (23, 26, 'telegram'),
+)
+VERDICT_STATUSES: dict = {verdict: status for status, verdict
+                          in hw.HOMEWORK_VERDICTS.items()}
+
+
+def iso(moment):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(moment))
+
+
+def make_timeline(rng, started):
+    """Смены статусов одного студента: список (время, работа, статус)."""
+    events = [(started - 100, 'hw_0', 'approved')]
+    moment, number = started + rng.uniform(0.5, 2), 1
+    while moment < started + DURATION:
+        name = f'hw_{number}'
+        events.append((int(moment), name, 'reviewing'))
+        moment += rng.uniform(1.5, 4)
+        events.append((int(moment),
+                       name, rng.choice(('approved', 'rejected'))))
+        moment += rng.uniform(1.5, 4)
+        number += 1
+    return [event for event in events if event[0] < started + DURATION]
+
+
+class Chaos:
+    """Расписание сбоев и журнал запросов к заглушкам."""
+
+    def __init__(self, started):
+        self.started = started
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.successes = collections.defaultdict(list)
+        self.messages = []
+
+    def fault(self, now=None):
+        elapsed = (time.time() if now is None else now) - self.started
+        for start, end, fault in FAULTS:
+            if start <= elapsed < end:
+                return fault
+        return None
+
+    def record(self, fault, token=None):
+        with self.lock:
+            self.requests[fault] += 1
+            if fault is None and token is not None:
+                self.successes[token].append(time.time())
+
+
+def practicum_handler(chaos, timelines):
+    """Заглушка API Практикума: работы, изменившиеся с from_date."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            fault = chaos.fault()
+            token = self.headers.get('Authorization', '')[len('OAuth '):]
+            chaos.record(fault if fault != 'telegram' else None, token)
+            if fault == 'server_error':
+                return self.reply(HTTPStatus.SERVICE_UNAVAILABLE, b'{}')
+            if fault == 'rate_limit':
+                return self.reply(HTTPStatus.TOO_MANY_REQUESTS, b'{}',
+                                  {'Retry-After': '1'})
+            if fault == 'reset':
+                self.connection.setsockopt(socket.SOL_SOCKET,
+                                           socket.SO_LINGER,
+                                           struct.pack('ii', 1, 0))
+                self.close_connection = True
+                return
+            if fault == 'latency':
+                time.sleep(REQUEST_TIMEOUT * 1.5)
+            query = parse_qs(urlparse(self.path).query)
+            from_date = int(query['from_date'][0])
+            now = time.time()
+            latest = {}
+            for moment, name, status in timelines.get(token, ()):
+                if moment <= now:
+                    latest[name] = (moment, name, status)
+            homeworks = [
+                {'homework_name': name, 'status': status,
+                 'date_updated': iso(moment)}
+                for moment, name, status in sorted(latest.values(),
+                                                   reverse=True)
+                if moment >= from_date
+            ]
+            body = json.dumps({'homeworks': homeworks,
+                               'current_date': int(now)}).encode()
+            if fault == 'malformed':
+                body = body[:len(body) // 2]
+            self.reply(HTTPStatus.OK, body)
+
+        def reply(self, status, body, headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def telegram_handler(chaos):
+    """Заглушка Bot API: запоминает отправленные сообщения."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            data = json.loads(self.rfile.read(length) or b'{}')
+            if chaos.fault() == 'telegram':
+                chaos.record('telegram')
+                body = b'{"ok": false, "description": "Bad Gateway"}'
+                self.send_response(HTTPStatus.BAD_GATEWAY)
+            else:
+                with chaos.lock:
+                    chaos.messages.append((int(data['chat_id']),
+                                           data['text']))
+                body = json.dumps({'ok': True, 'result': {
+                    'message_id': len(chaos.messages), 'date': 0,
+                    'chat': {'id': int(data['chat_id']), 'type': 'private'},
+                    'text': data['text'],
+                }}).encode()
+                self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def accelerate():
+    """Переводит worker.py на расписание в доли секунды."""
+    hw.REQUEST_TIMEOUT = REQUEST_TIMEOUT
+    hw.RETRY_PERIOD = TICK
+    worker.CONFIG_POLL_PERIOD = TICK
+    worker.poll_interval = lambda *args: TICK
+    outbox.OUTBOX_RETRY_INTERVAL = TICK
+    outbox.OUTBOX_MAX_DELAY = TICK * 4
+
+
+def recovery_times(chaos, depths, tokens):
+    """Время от конца сбоя до успешного опроса всех и пустого outbox."""
+    times = {}
+    for _, end, fault in FAULTS:
+        end += chaos.started
+        moments = []
+        for token in tokens:
+            after = [moment for moment in chaos.successes[token]
+                     if moment >= end]
+            moments.append(after[0] if after else float('inf'))
+        drained = [moment for moment, depth in depths
+                   if moment >= end and not depth]
+        moments.append(drained[0] if drained else float('inf'))
+        times[fault] = max(moments) - end
+    return times
+
+
+def check_notifications(chaos, timelines, chats):
+    """Дубли и потери: последний статус каждой работы доходит один раз.
+
+    Промежуточные статусы, сменившиеся до следующего опроса, API уже не
+    отдаёт, поэтому потерей считается только недоставленный последний.
+    """
+    delivered = collections.Counter()
+    notices = 0
+    for chat_id, text in chaos.messages:
+        if not text.startswith('Изменился статус'):
+            notices += 1
+            continue
+        name = text.split('"')[1]
+        status = VERDICT_STATUSES[text.split('". ', 1)[1]]
+        delivered[(chat_id, name, status)] += 1
+    duplicates = sum(count - 1 for count in delivered.values())
+    lost = 0
+    for token, events in timelines.items():
+        # Работы до запуска не в счёт: при первом опросе уведомляют
+        # только о последней из них
+        final = {name: status for moment, name, status in events
+                 if moment >= int(chaos.started)}
+        lost += sum((chats[token], name, status) not in delivered
+                    for name, status in final.items())
+    return duplicates, lost, notices
+
+
+def main():
+    logging.disable(logging.ERROR)
+    rng = random.Random(SEED)
+    started = time.time()
+    chaos = Chaos(started)
+    tokens = [f'token-{number}' for number in range(TENANTS)]
+    chats = {token: 1000 + number for number, token in enumerate(tokens)}
+    timelines = {token: make_timeline(rng, started) for token in tokens}
+
+    practicum = serve(practicum_handler(chaos, timelines))
+    bot_api = serve(telegram_handler(chaos))
+    hw.ENDPOINT = (f'http://127.0.0.1:{practicum.server_port}'
+                   '/api/user_api/homework_statuses/')
+    accelerate()
+
+    config = TenantConfig(':memory:')
+    for token in tokens:
+        config.upsert(token, token, chats[token])
+    bot = telegram.Bot(
+        token='1234:abcdefg',
+        base_url=f'http://127.0.0.1:{bot_api.server_port}/bot')
+    chaos_worker = worker.Worker(
+        bot, config, Outbox(':memory:'),
+        governor=Governor(':memory:', rate=1000, burst=1000))
+    chaos_worker.retry = RetryPolicy(base=TICK / 4, cap=TICK)
+    chaos_worker.outbox.start_worker(chaos_worker.sender.send_to_chat,
+                                     interval=TICK)
+
+    tracemalloc.start()
+    stop = threading.Event()
+    threading.Thread(target=chaos_worker.run, args=(stop,),
+                     daemon=True).start()
+    memory = [tracemalloc.get_traced_memory()[0]]
+    depths = []
+    while time.time() < started + DURATION + SETTLE:
+        depths.append((time.time(), len(chaos_worker.outbox)))
+        if time.time() < started + 1:
+            memory[0] = tracemalloc.get_traced_memory()[0]
+        time.sleep(TICK / 5)
+    stop.set()
+    memory.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+
+    print(f'{TENANTS} студентов, опрос раз в {TICK} с,'
+          f' {DURATION:.0f} с со сбоями и {SETTLE:.0f} с на восстановление')
+    print(f'Успешных запросов к API: {chaos.requests[None]}')
+    recovery = recovery_times(chaos, depths, tokens)
+    for start, end, fault in FAULTS:
+        print(f'{fault:>13} ({start:>2}-{end:>2} с): восстановление'
+              f' {recovery[fault]:5.2f} с, запросов впустую'
+              f' {chaos.requests[fault]:4}')
+    duplicates, lost, notices = check_notifications(chaos, timelines, chats)
+    print(f'Уведомлений: {len(chaos.messages)}, о сбоях {notices},'
+          f' дублей {duplicates}, потеряно {lost}')
+    print(f'Прирост памяти: {(memory[1] - memory[0]) / 1024:.0f} КиБ')
+
+
+if __name__ == '__main__':
+    main()
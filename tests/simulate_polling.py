@@ -0,0 +1,69 @@
+"""Моделирование опросов: объём запросов против задержки уведомлений.
+
+Запуск из корня репозитория: python -m tests.simulate_polling
+"""
+import bisect
+import random
+import statistics
+
+from polling import POLL_BASE_INTERVAL, poll_interval
+
+DAY: int = 24 * 60 * 60
+DAYS: int = 60
+TENANTS: int = 300
+IDLE_SHARE: float = 0.3
+SEED: int = 26
+
+
+def make_timeline(rng):
+    """События одного студента: список (время, статус) по возрастанию."""
+    events = []
+    if rng.random() < IDLE_SHARE:
+        return [(-rng.uniform(7, 90) * DAY, 'approved')]
+    moment = rng.uniform(0, 7) * DAY
+    while moment < DAYS * DAY:
+        events.append((moment, 'reviewing'))
+        moment += rng.uniform(0.5, 48) * 60 * 60
+        verdict = 'approved' if rng.random() < 0.6 else 'rejected'
+        events.append((moment, verdict))
+        moment += rng.uniform(1, 3 if verdict == 'rejected' else 14) * DAY
+    return events
+
+
+def simulate(timeline, adaptive):
+    """Возвращает число запросов и задержки обнаружения смен статуса."""
+    moments = [moment for moment, _ in timeline]
+    now, requests, latencies = 0.0, 0, []
+    seen = bisect.bisect_right(moments, now)
+    while now < DAYS * DAY:
+        requests += 1
+        known = bisect.bisect_right(moments, now)
+        latencies.extend(now - moment for moment in moments[seen:known])
+        seen = known
+        if not adaptive:
+            now += POLL_BASE_INTERVAL
+            continue
+        status, updated = timeline[known - 1][1], moments[known - 1]
+        now += poll_interval(status, updated if known else 0, now)
+    return requests, latencies
+
+
+def main():
+    rng = random.Random(SEED)
+    timelines = [make_timeline(rng) for _ in range(TENANTS)]
+    for adaptive in (False, True):
+        requests, latencies = 0, []
+        for timeline in timelines:
+            tenant_requests, tenant_latencies = simulate(timeline, adaptive)
+            requests += tenant_requests
+            latencies.extend(tenant_latencies)
+        quantiles = statistics.quantiles(latencies, n=20)
+        name = 'адаптивный' if adaptive else 'фиксированный'
+        print(f'{name:>14}: {requests / TENANTS / DAYS:6.1f} запросов'
+              f' на студента в день, задержка уведомления: средняя'
+              f' {statistics.mean(latencies) / 60:6.1f} мин,'
+              f' p95 {quantiles[-1] / 60:6.1f} мин')
+
+
+if __name__ == '__main__':
+    main()
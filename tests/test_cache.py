@@ -0,0 +1,90 @@
+import time
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import exceptions as ex
+import homework
+import utils
+from cache import ResponseCache
+from governor import Governor
+from metrics import METRICS
+from retry import RetryPolicy
+
+
+class TestResponseCache:
+    RESPONSE = {'homeworks': [], 'current_date': 123246}
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_tenants=2)
+        cache.put('first', self.RESPONSE)
+        cache.put('second', self.RESPONSE)
+        cache.get('first')
+        cache.put('third', self.RESPONSE)
+        assert cache.get('second') is None, (
+            'Из кэша должна вытесняться давно не использованная запись.'
+        )
+        assert cache.get('first') is not None
+        assert cache.metrics()['evictions'] == 1
+
+    def test_spill_to_disk(self, tmp_path):
+        cache = ResponseCache(max_tenants=1, spill_dir=str(tmp_path))
+        cache.put('first', self.RESPONSE, 'state')
+        cache.put('second', self.RESPONSE)
+        entry = cache.get('first')
+        assert entry is not None and entry.state == 'state', (
+            'Вытесненная запись должна подниматься с диска.'
+        )
+
+    def test_hit_miss_metrics(self):
+        cache = ResponseCache()
+        cache.get('tenant')
+        cache.put('tenant', self.RESPONSE)
+        cache.get('tenant')
+        metrics = cache.metrics()
+        assert (metrics['hits'], metrics['misses']) == (1, 1)
+
+    def test_stale_entry_refreshed_in_background(self):
+        cache = ResponseCache(stale_after=0)
+        cache.put('tenant', self.RESPONSE, 'old')
+        time.sleep(0.01)
+
+        def fetch():
+            time.sleep(0.05)
+            return self.RESPONSE, 'new'
+
+        entry = cache.get_or_refresh('tenant', fetch, wait=0)
+        assert entry.state == 'old', (
+            'Устаревшая запись должна отдаваться сразу, без ожидания API.'
+        )
+        assert METRICS.snapshot()['cache']['stale_served'] == 1, (
+            'Показатели кэша должны публиковаться в METRICS.'
+        )
+        for _ in range(100):
+            if cache.get('tenant').state == 'new':
+                break
+            time.sleep(0.01)
+        assert cache.get('tenant').state == 'new'
+        assert cache.is_stale('tenant')
+
+    def test_fresh_entry_for_other_state_is_refreshed(self):
+        cache = ResponseCache()
+        cache.put('tenant', self.RESPONSE, 100)
+        entry = cache.get_or_refresh('tenant', lambda: (self.RESPONSE, 200),
+                                     state=200)
+        assert entry.state == 200, (
+            'Запись, полученная для другого состояния, не считается свежей.'
+        )
+
+    def test_revoked_token_is_not_answered_from_cache(self, monkeypatch):
+        cache = ResponseCache(stale_after=0)
+        cache.put(homework.TELEGRAM_CHAT_ID, self.RESPONSE,
+                  (('hw', 'approved'), 'text', None))
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda *args, **kwargs: utils.MockResponseGET(
+                http_status=HTTPStatus.UNAUTHORIZED))
+        with pytest.raises(ex.Unauthorized):
+            homework.poll_status(cache, Governor(':memory:'), RetryPolicy(),
+                                 0)
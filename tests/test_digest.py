@@ -0,0 +1,35 @@
+from digest import DIGEST_TITLE, Digest
+from metrics import METRICS
+
+
+class TestDigest:
+
+    def test_superseded_status_is_dropped(self):
+        digest = Digest(window=600)
+        digest.add(['101'], ('hw1', 'reviewing@1'), 'hw1 reviewing', 1)
+        digest.add(['101'], ('hw2', 'approved@2'), 'hw2 approved', 2)
+        digest.add(['101'], ('hw1', 'rejected@3'), 'hw1 rejected', 3)
+        assert digest.pop(now=0) == [], (
+            'Дайджест не должен отправляться до истечения окна.'
+        )
+
+        [(chat_id, key, text, changed_at, _)] = digest.pop(['101'])
+        assert chat_id == '101'
+        assert text.split('\n') == [DIGEST_TITLE, 'hw2 approved',
+                                    'hw1 rejected'], (
+            'Промежуточный статус, перекрытый более новым, '
+            'не должен попадать в дайджест.'
+        )
+        assert changed_at == 2
+        assert key == ('', 'hw2:approved@2;hw1:rejected@3')
+        assert METRICS.snapshot()['digest_sends_saved'] == 2
+
+    def test_single_change_is_sent_as_is(self):
+        digest = Digest()
+        digest.add(['101', '201'], ('hw1', 'approved'), 'hw1 approved')
+        ready = sorted(digest.pop())
+        assert [item[:3] for item in ready] == [
+            ('101', ('hw1', 'approved'), 'hw1 approved'),
+            ('201', ('hw1', 'approved'), 'hw1 approved'),
+        ]
+        assert len(digest) == 0
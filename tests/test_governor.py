@@ -0,0 +1,73 @@
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import exceptions as ex
+import homework
+import utils
+from governor import Governor
+from retry import RetryPolicy
+
+
+class TestGovernor:
+
+    def test_burst_then_spaced_slots(self):
+        governor = Governor(':memory:', rate=2, burst=2)
+        now = 1000.0
+        governor._conn.execute('UPDATE buckets SET updated = ?', (now,))
+        delays = [governor.reserve(now) for _ in range(4)]
+        assert delays == [0, 0, 0.5, 1.0], (
+            'Сверх запаса запросы должны откладываться с шагом 1/rate, '
+            'а не отклоняться.'
+        )
+
+    def test_limit_is_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / 'governor.sqlite3')
+        first = Governor(path, rate=1, burst=1)
+        second = Governor(path, rate=1, burst=1)
+        now = 1000.0
+        first._conn.execute('UPDATE buckets SET updated = ?', (now,))
+        assert first.reserve(now) == 0
+        assert second.reserve(now) == 1.0
+
+    def test_pause_defers_following_slots(self):
+        governor = Governor(':memory:', rate=1, burst=5)
+        now = 1000.0
+        governor._conn.execute('UPDATE buckets SET updated = ?', (now,))
+        governor.pause(30, now)
+        assert governor.reserve(now) == 31.0, (
+            'После Retry-After слоты должны выдаваться не раньше паузы.'
+        )
+
+    def test_each_retry_takes_a_slot(self):
+        governor = Governor(':memory:', rate=1, burst=10)
+        retry = RetryPolicy(attempts=3, wait=lambda delay: None)
+        attempts = []
+
+        def request():
+            attempts.append(1)
+            raise ex.ServerError('503')
+
+        with pytest.raises(ex.ServerError):
+            retry.call(governor.paced(request))
+        tokens = governor._conn.execute(
+            'SELECT tokens FROM buckets').fetchone()[0]
+        assert len(attempts) == 3
+        assert tokens == pytest.approx(8, abs=0.1), (
+            'Каждый повтор запроса должен занимать свой слот governor, '
+            'кроме первого, занятого вызывающим.'
+        )
+
+    def test_retry_after_is_parsed(self, monkeypatch):
+        def mock_get(*args, **kwargs):
+            response = utils.MockResponseGET(
+                http_status=HTTPStatus.TOO_MANY_REQUESTS)
+            response.headers = {'Retry-After': '120'}
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        with pytest.raises(ex.TooManyRequests) as error:
+            homework.get_api_answer(0)
+        assert error.value.retry_after == 120
+        assert isinstance(error.value, ex.InvalidStatusCodeAPI)
@@ -0,0 +1,47 @@
+import json
+import socket
+import urllib.error
+import urllib.request
+
+from health import report, start_health_server
+from metrics import METRICS
+
+
+class TestHealth:
+
+    def test_report_flags_hung_loop(self):
+        values = {'started': 0, 'cycle': 100, 'api_success': 100}
+        state = report(values, 10, 600, now=105)
+        assert state['live'] and state['ready']
+        state = report(values, 10, 600, now=200)
+        assert not state['live'], (
+            'Зависший цикл опроса должен отмечаться как нездоровый.'
+        )
+        assert state['loop_lag'] == 100
+
+    def test_report_flags_overdue_tenants(self):
+        values = {'started': 0, 'cycle': 100, 'api_success': 100,
+                  'overdue_tenants': 3}
+        state = report(values, 10, 600, now=105)
+        assert state['live'] and not state['ready']
+
+    def test_endpoint(self):
+        server = start_health_server(600, 600, port=0)
+        assert server is None, 'Без порта сервер проб не запускается.'
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        server = start_health_server(600, 600, port=port)
+        try:
+            METRICS.mark('cycle')
+            METRICS.mark('api_success')
+            url = f'http://127.0.0.1:{port}'
+            with urllib.request.urlopen(f'{url}/health') as response:
+                assert json.load(response)['live']
+            try:
+                urllib.request.urlopen(f'{url}/unknown')
+            except urllib.error.HTTPError as error:
+                assert error.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
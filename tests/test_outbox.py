@@ -0,0 +1,142 @@
+import time
+
+import exceptions as ex
+import outbox as outbox_module
+from metrics import METRICS, NOTIFY_SLO
+from outbox import PRIORITY_NOTICE, Outbox
+
+
+class TestOutbox:
+
+    def test_delivered_message_is_not_added_again(self, tmp_path):
+        path = str(tmp_path / 'outbox.sqlite3')
+        outbox = Outbox(path)
+        assert outbox.add('12345', 'hw123', 'approved', 'text')
+        outbox.ack('12345', 'hw123', 'approved')
+        assert len(outbox) == 0
+
+        restarted = Outbox(path)
+        assert not restarted.add('12345', 'hw123', 'approved', 'text'), (
+            'После перезапуска доставленное уведомление не должно '
+            'отправляться повторно.'
+        )
+
+    def test_failed_message_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.sqlite3')
+        outbox = Outbox(path)
+        outbox.add('12345', 'hw123', 'rejected', 'text')
+        outbox.fail('12345', 'hw123', 'rejected')
+        assert len(Outbox(path)) == 1, (
+            'Неотправленное уведомление должно сохраняться в outbox.'
+        )
+
+    def test_drain_retries_with_backoff(self):
+        outbox = Outbox(':memory:')
+        outbox.add('12345', 'hw123', 'approved', 'first')
+        outbox.add('12345', 'hw456', 'approved', 'second')
+        assert outbox.due(now=0) == []
+
+        sent = []
+        outbox._conn.execute('UPDATE outbox SET next_attempt = 0')
+        assert outbox.drain(lambda chat_id, text: False) == (0, 2)
+        assert outbox.due() == [], (
+            'После неудачной попытки отправка должна откладываться.'
+        )
+        outbox._conn.execute('UPDATE outbox SET next_attempt = 0')
+        outbox.drain(lambda chat_id, text: sent.append(text) or True)
+        assert sorted(sent) == ['first', 'second']
+        assert len(outbox) == 0
+
+    def test_ack_records_delivery_latency(self):
+        outbox = Outbox(':memory:')
+        now = time.time()
+        outbox.send('12345', 'hw123', 'approved', 'fast',
+                    lambda chat_id, text: True, now - 100, 'latency-test')
+        outbox.send('12345', 'hw456', 'approved', 'slow',
+                    lambda chat_id, text: True, now - NOTIFY_SLO - 100,
+                    'latency-test')
+        report = METRICS.latency_report()['latency-test']
+        assert report['count'] == 2, (
+            'Задержка от смены статуса до доставки должна учитываться '
+            'по когорте арендатора.'
+        )
+        assert report['breaches'] == 1
+        assert report['p50'] == 300
+
+    def test_saturated_outbox_sheds_superseded_and_notices(self):
+        outbox = Outbox(':memory:', capacity=3)
+        outbox.add('12345', 'hw123', 'reviewing', 'old status')
+        outbox.add('12345', '', 'error', 'failure',
+                   priority=PRIORITY_NOTICE)
+        outbox.add('12345', 'hw123', 'approved', 'new status')
+        assert len(outbox) == 3
+        outbox.add('12345', 'hw456', 'approved', 'other status')
+        outbox.add('12345', 'hw789', 'approved', 'third status')
+        outbox._conn.execute('UPDATE outbox SET next_attempt = 0')
+        assert [text for *_, text in outbox.due()] == [
+            'new status', 'other status', 'third status'], (
+            'При переполнении сначала отбрасываются устаревшие статусы '
+            'работы, затем сообщения о сбоях.'
+        )
+        assert outbox.shed == 2
+
+        outbox.add('12345', 'hw000', 'approved', 'fourth status')
+        assert len(outbox) == 4, (
+            'Актуальные смены статусов не должны отбрасываться.'
+        )
+        assert outbox.saturated()
+
+    def test_status_changes_are_retried_before_notices(self):
+        outbox = Outbox(':memory:')
+        outbox.add('12345', '', 'error', 'failure',
+                   priority=PRIORITY_NOTICE)
+        outbox.add('12345', 'hw123', 'approved', 'status')
+        outbox._conn.execute('UPDATE outbox SET next_attempt = 0')
+        assert [text for *_, text in outbox.due(limit=1)] == ['status']
+
+    def test_pending_message_is_not_sent_twice(self):
+        outbox = Outbox(':memory:')
+        sent = []
+        outbox.add('12345', 'hw123', 'approved', 'text')
+        outbox._conn.execute('UPDATE outbox SET next_attempt = 0')
+        assert len(outbox.claim()) == 1
+        assert outbox.claim() == [], (
+            'Забранное на отправку уведомление не должно выдаваться снова.'
+        )
+        assert outbox.send('12345', 'hw123', 'approved', 'text',
+                           lambda chat_id, text: sent.append(text)
+                           or True) is None
+        assert sent == [], (
+            'Уведомление, уже ждущее отправки, не должно отправляться '
+            'повторно.'
+        )
+
+    def test_undeliverable_messages_leave_the_queue(self, monkeypatch):
+        outbox = Outbox(':memory:', capacity=2)
+
+        def dead_chat(chat_id, text):
+            raise ex.ChatUnavailable('Chat not found')
+
+        assert outbox.send('404', 'hw1', 'approved', 'text',
+                           dead_chat) is False
+        assert len(outbox) == 0 and outbox.dead == 1, (
+            'Уведомление в недоступный чат должно уходить из очереди.'
+        )
+        monkeypatch.setattr(outbox_module, 'OUTBOX_MAX_ATTEMPTS', 2)
+        outbox.send('101', 'hw1', 'approved', 'text', lambda *args: False)
+        outbox._conn.execute('UPDATE outbox SET next_attempt = 0')
+        assert outbox.drain(lambda *args: False) == (0, 1)
+        assert not outbox.saturated() and outbox.dead == 2, (
+            'После OUTBOX_MAX_ATTEMPTS попыток уведомление не должно '
+            'занимать место в очереди.'
+        )
+
+    def test_flush_drains_more_than_one_batch(self):
+        outbox = Outbox(':memory:')
+        for number in range(5):
+            outbox.add('101', f'hw{number}', 'approved', 'text')
+        outbox._conn.execute('UPDATE outbox SET next_attempt = 0')
+        assert outbox.flush(lambda *args: True, batch_size=2) == (5, 0), (
+            'Очередь должна разбираться, пока пачки уходят целиком.'
+        )
+        assert len(outbox) == 0
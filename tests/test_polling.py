@@ -0,0 +1,25 @@
+from polling import (POLL_BASE_INTERVAL, POLL_MAX_INTERVAL,
+                     POLL_MIN_INTERVAL, poll_interval)
+
+DAY = 24 * 60 * 60
+
+
+class TestPollInterval:
+
+    def test_recent_activity_is_polled_often(self):
+        assert poll_interval('approved', 1000, 1000 + 60) == POLL_MIN_INTERVAL
+        assert poll_interval('reviewing', 1000,
+                             1000 + DAY) == POLL_BASE_INTERVAL
+
+    def test_idle_tenant_decays_within_bounds(self):
+        intervals = [poll_interval('rejected', 1000, 1000 + days * DAY)
+                     for days in (1, 2, 3, 30)]
+        assert intervals == sorted(intervals), (
+            'Интервал опроса должен расти с простоем арендатора.'
+        )
+        assert intervals[-1] == POLL_MAX_INTERVAL
+        assert (poll_interval('approved', 1000, 1000 + DAY)
+                > poll_interval('rejected', 1000, 1000 + DAY))
+
+    def test_unknown_state_uses_base_interval(self):
+        assert poll_interval('', 0, 1000) == POLL_BASE_INTERVAL
@@ -0,0 +1,34 @@
+import os
+
+import homework
+from profiler import STAGES, Profiler
+
+
+class TestProfiler:
+
+    def test_disabled_profiler_does_nothing(self, tmp_path):
+        profiler = Profiler(out_dir=str(tmp_path), cycles=0)
+        with profiler.cycle():
+            pass
+        assert os.listdir(tmp_path) == []
+
+    def test_profiles_requested_cycles(self, tmp_path):
+        profiler = Profiler(out_dir=str(tmp_path), cycles=2)
+        homework_data = {'homework_name': 'hw123', 'status': 'approved'}
+        for _ in range(3):
+            with profiler.cycle():
+                homework.parse_status(homework_data)
+        assert profiler.remaining == 0
+        files = sorted(os.listdir(tmp_path))
+        assert [os.path.splitext(name)[1] for name in files] == [
+            '.prof', '.txt'
+        ], 'После N циклов профиль должен сохраняться на диск.'
+        with open(tmp_path / files[1], encoding='utf-8') as file:
+            report = file.read()
+        stages = {
+            line.split()[0]: line.split()[1:]
+            for line in report.splitlines()[1:len(STAGES) + 1]
+        }
+        assert stages['parse_status'][0] == '2', (
+            'Время этапа parse_status должно попадать в отчёт.'
+        )
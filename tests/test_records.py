@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import exceptions as ex
+import homework
+import records
+
+
+def make_payload(homeworks):
+    return json.dumps({'homeworks': homeworks,
+                       'current_date': 1000198000}).encode()
+
+
+class TestRecords:
+
+    @pytest.mark.parametrize('use_orjson', [True, False])
+    def test_decode_matches_dict_path(self, monkeypatch, use_orjson):
+        if not use_orjson:
+            monkeypatch.setattr(records, 'orjson', None)
+        homeworks = [
+            {'homework_name': 'hw123', 'status': 'approved',
+             'date_updated': '2020-02-13T14:40:57Z'},
+            {'homework_name': 'hw124', 'status': 'reviewing'},
+        ]
+        answer = records.decode(make_payload(homeworks))
+        assert answer.current_date == 1000198000
+        for record, homework_dict in zip(answer.homeworks, homeworks):
+            assert record.status is records.Verdict(homework_dict['status'])
+            assert record.key == homework.delivery_key(homework_dict)
+            assert record.message == homework.parse_status(homework_dict), (
+                'Быстрый разбор должен давать те же уведомления, что и '
+                '`parse_status`.'
+            )
+            assert record.updated_at == homework.parse_date(
+                homework_dict.get('date_updated'))
+
+    @pytest.mark.parametrize('payload, error', [
+        (b'[]', ex.InvalidResponseType),
+        (b'{"homeworks": []}', ex.MissingResponseKey),
+        (b'{"homeworks": {}, "current_date": 0}', ex.InvalidResponseType),
+        (make_payload([{'homework_name': 'hw123', 'status': 'unknown'}]),
+         ex.APIReturningUnknownArgument),
+        (make_payload([{'status': 'approved'}]), ex.MissingResponseKey),
+    ])
+    def test_invalid_payload_is_schema_error(self, payload, error):
+        with pytest.raises(error):
+            records.decode(payload)
+
+    @pytest.mark.parametrize('date_updated, updated_at', [
+        ('2020-02-13T14:40:57.123Z', 1581604857),
+        ('2020-02-13T14:40:57+00:00', 1581604857),
+        ('13.02.2020', 0),
+    ])
+    def test_unusual_date_does_not_block_record(self, date_updated,
+                                                updated_at):
+        answer = records.decode(make_payload([
+            {'homework_name': 'hw123', 'status': 'approved',
+             'date_updated': date_updated}]))
+        assert answer.homeworks[0].updated_at == updated_at, (
+            'Нераспознанная дата не должна мешать уведомлению о статусе.'
+        )
@@ -0,0 +1,72 @@
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import exceptions as ex
+import homework
+import utils
+from retry import PERMANENT, RETRY_AFTER, TRANSIENT, RetryPolicy, classify
+
+
+class TestRetryPolicy:
+
+    @pytest.mark.parametrize('status_code, kind', [
+        (HTTPStatus.INTERNAL_SERVER_ERROR, TRANSIENT),
+        (HTTPStatus.BAD_GATEWAY, TRANSIENT),
+        (HTTPStatus.TOO_MANY_REQUESTS, RETRY_AFTER),
+        (HTTPStatus.UNAUTHORIZED, PERMANENT),
+        (HTTPStatus.NOT_FOUND, None),
+    ])
+    def test_status_codes_are_classified(self, monkeypatch, status_code,
+                                         kind):
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda *args, **kwargs: utils.MockResponseGET(
+                http_status=status_code))
+        with pytest.raises(ex.InvalidStatusCodeAPI) as error:
+            homework.request_api(homework.HEADERS, 0)
+        assert classify(error.value) == kind
+
+    def test_connection_error_and_schema_are_classified(self, monkeypatch):
+        def broken_get(*args, **kwargs):
+            raise requests.ConnectionError('Connection reset by peer')
+
+        monkeypatch.setattr(requests, 'get', broken_get)
+        with pytest.raises(ConnectionError) as error:
+            homework.request_api(homework.HEADERS, 0)
+        assert classify(error.value) == TRANSIENT
+        with pytest.raises(TypeError) as error:
+            homework.check_response([])
+        assert classify(error.value) == PERMANENT
+
+    def test_transient_errors_are_retried_with_capped_backoff(self):
+        delays = []
+        calls = []
+        policy = RetryPolicy(attempts=4, base=1, cap=2, wait=delays.append)
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 4:
+                raise ex.ServerError('Неверный ответ API: 503')
+            return 'ok'
+
+        assert policy.call(flaky) == 'ok'
+        assert len(delays) == 3
+        assert all(delay <= 2 for delay in delays), (
+            'Задержка между повторами не должна превышать предел.'
+        )
+
+    def test_other_errors_are_not_retried(self):
+        delays = []
+        policy = RetryPolicy(attempts=3, wait=delays.append)
+        for error in (ex.Unauthorized('401'), ex.TooManyRequests('429', 60),
+                      ValueError('bug')):
+            def failing():
+                raise error
+
+            with pytest.raises(type(error)):
+                policy.call(failing)
+        assert delays == [], (
+            'Повторять внутри цикла нужно только временные сбои.'
+        )
@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import METRICS
+from sinks import SinkPipeline, Transition, from_config
+
+
+def make_event(number):
+    return Transition('first', 'cohort-1', f'hw{number}', 'approved',
+                      1581604857, time.time())
+
+
+class TestSinks:
+
+    def test_events_reach_ndjson_and_sqlite(self, tmp_path):
+        ndjson = tmp_path / 'transitions.ndjson'
+        database = tmp_path / 'transitions.sqlite3'
+        pipeline = from_config(f'ndjson:{ndjson},sqlite:{database}',
+                               batch_size=2, flush_interval=60)
+        for number in range(3):
+            pipeline.emit(make_event(number))
+        pipeline.close()
+
+        lines = [json.loads(line) for line in ndjson.read_text().splitlines()]
+        assert [line['homework'] for line in lines] == ['hw0', 'hw1', 'hw2']
+        rows = sqlite3.connect(database).execute(
+            'SELECT homework, status FROM transitions').fetchall()
+        assert len(rows) == 3, (
+            'При остановке конвейер должен дописать неполную пачку.'
+        )
+        assert pipeline.stats['ndjson'].batches == 2
+        assert METRICS.values['sinks']['sqlite']['written'] == 3
+
+    def test_webhook_receives_batches(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers['Content-Length'])
+                received.append(json.loads(self.rfile.read(length)))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        pipeline = from_config(
+            f'webhook:http://127.0.0.1:{server.server_port}/hook',
+            batch_size=10, flush_interval=0.05)
+        pipeline.emit(make_event(1))
+        pipeline.emit(make_event(2))
+        time.sleep(0.3)
+        assert [len(batch) for batch in received] == [2], (
+            'События должны отправляться пачкой по истечении интервала.'
+        )
+        pipeline.close()
+        server.shutdown()
+
+    def test_emit_does_not_block_on_slow_sink(self):
+        release = threading.Event()
+
+        class SlowSink:
+            def write(self, events):
+                release.wait()
+
+        pipeline = SinkPipeline({'slow': SlowSink()}, batch_size=1,
+                                queue_size=2)
+        started = time.monotonic()
+        for number in range(10):
+            pipeline.emit(make_event(number))
+        assert time.monotonic() - started < 0.5
+        assert pipeline.stats['slow'].dropped > 0, (
+            'Переполнение очереди медленного приёмника не должно '
+            'задерживать цикл опроса.'
+        )
+        release.set()
+        pipeline.close()
@@ -0,0 +1,51 @@
+from tenants import TenantTable
+
+
+class TestTenantTable:
+
+    def test_add_get_and_reuse_rows(self):
+        table = TenantTable()
+        table.add('first', 'token1', '101')
+        table.add('second', 'token2', '102')
+        table.remove('first')
+        table.add('third', 'token3', '103', cursor=5)
+        assert len(table) == 2
+        assert len(table.tokens) == 2, (
+            'Строка удалённого арендатора должна переиспользоваться.'
+        )
+        tenant = table.get('third')
+        assert (tenant.token, tenant.chat_id, tenant.cursor,
+                tenant.status) == ('token3', 103, 5, '')
+        assert table.get('first') is None
+
+    def test_channel_usernames_are_kept(self):
+        table = TenantTable()
+        table.add('channel', 'token1', '@mychannel', subscribers=['@group',
+                                                                  '-100201'])
+        assert table.get('channel').recipients == ('@mychannel', '@group',
+                                                   -100201), (
+            'Чаты вида @channel должны поддерживаться наравне с числовыми.'
+        )
+        table.remove('channel')
+        table.add('numeric', 'token2', '101')
+        assert table.get('numeric').chat_id == 101, (
+            'Имя канала не должно оставаться у переиспользованной строки.'
+        )
+
+    def test_status_is_interned_code(self):
+        table = TenantTable()
+        table.add('tenant', 'token', '101')
+        assert table.set_status('tenant', 'reviewing', 1000)
+        assert not table.set_status('tenant', 'reviewing', 1000), (
+            'Повторный статус не должен считаться изменением.'
+        )
+        assert table.set_status('tenant', 'approved', 2000)
+        assert table.status('tenant') == 'approved'
+        assert table.statuses.itemsize == 1
+
+    def test_error_counter(self):
+        table = TenantTable()
+        table.add('tenant', 'token', '101')
+        table.record_error('tenant')
+        assert table.record_error('tenant') == 2
+        assert table.record_error('tenant', failed=False) == 0
@@ -0,0 +1,424 @@
+import threading
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import requests
+import telegram
+
+import utils
+from outbox import Outbox
+from scheduler import Scheduler
+from digest import Digest
+from metrics import METRICS
+from tenant_config import TenantConfig
+from worker import EXIT_PARTIAL, Worker, run_batch
+
+
+def create_worker(tmp_path):
+    config = TenantConfig(str(tmp_path / 'tenants.sqlite3'))
+    bot = utils.MockTelegramBot()
+    worker = Worker(bot, config, Outbox(':memory:'), threads=1)
+    worker.retry.wait = lambda delay: None
+    return config, worker
+
+
+class TestScheduler:
+
+    def test_reschedule_and_cancel(self):
+        now = [0]
+        scheduler = Scheduler(clock=lambda: now[0])
+        scheduler.schedule('first', 10)
+        scheduler.schedule('second', 5)
+        scheduler.schedule('first', 1)
+        scheduler.schedule('third', 2)
+        scheduler.cancel('third')
+        assert scheduler.next_due() == 1
+        assert scheduler.pop_due(10) == [('first', 1), ('second', 5)], (
+            'Перепланированный и отменённый опросы не должны выполняться '
+            'по старому расписанию.'
+        )
+        assert scheduler.next_due() is None
+
+    def test_overdue_counts_waiting_and_deferred_polls(self):
+        now = [0]
+        scheduler = Scheduler(clock=lambda: now[0])
+        for number in range(10):
+            scheduler.schedule(f'tenant{number}', number * 10)
+        scheduler.schedule('tenant0', 200)
+        now[0] = 100
+        scheduler.schedule('deferred', 50, since=20)
+        assert scheduler.overdue(now[0] - 60) == 4, (
+            'Просроченными должны считаться опросы, ждущие в расписании, '
+            'в том числе перенесённые, по изначальному времени.'
+        )
+        assert ('deferred', 20) in scheduler.pop_due(150)
+
+
+class TestWorker:
+
+    def test_reload_applies_only_changes(self, tmp_path):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'token1', '101')
+        config.upsert('second', 'token2', '102')
+        assert worker.reload() == 2
+        assert len(worker.scheduler) == 2
+
+        due_at = worker.scheduler.due_at('first')
+        config.upsert('first', 'token1-new', '101')
+        config.delete('second')
+        assert worker.reload() == 2, (
+            'Применяться должны только изменившиеся арендаторы.'
+        )
+        assert worker.table.get('first').token == 'token1-new'
+        assert 'second' not in worker.table
+        assert 'second' not in worker.scheduler
+        assert worker.scheduler.due_at('first') == due_at, (
+            'Смена токена не должна сбивать расписание опросов.'
+        )
+        assert worker.reload() == 0
+
+    def test_bad_change_does_not_block_others(self, tmp_path):
+        config, worker = create_worker(tmp_path)
+        config.upsert('broken', 'token1', '9' * 20)
+        config.upsert('channel', 'token2', '@mychannel')
+        config.upsert('second', 'token3', '102')
+        assert worker.reload() == 3
+        assert 'broken' not in worker.table
+        assert 'broken' not in worker.scheduler, (
+            'Отклонённый арендатор не должен попадать в расписание.'
+        )
+        assert worker.table.get('channel').chat_id == '@mychannel'
+        assert 'second' in worker.table, (
+            'Ошибка в одном изменении не должна терять следующие.'
+        )
+        assert len(worker.table.tokens) == len(worker.table.chat_ids) == 2
+
+    def test_poll_sends_new_status_to_tenant_chat(self, tmp_path,
+                                                  monkeypatch):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'token1', '101')
+        worker.reload()
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'approved',
+                           'date_updated': '2020-02-13T14:40:57Z'}],
+            'current_date': 1000198000,
+        }
+        requests_sent = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            requests_sent.append(headers['Authorization'])
+            response = utils.MockResponseGET()
+            response.json = lambda: data
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        worker.poll('first')
+        worker.poll('first')
+        assert requests_sent == ['OAuth token1', 'OAuth token1']
+        assert worker.bot.chat_id == 101
+        assert 'hw123' in worker.bot.text
+        assert worker.table.get('first').cursor == 1000198000
+        assert len(worker.outbox) == 0
+
+    def test_initial_status_is_not_counted_as_latency(self, tmp_path,
+                                                      monkeypatch):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'token1', '101')
+        worker.reload()
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'reviewing',
+                           'date_updated': '2020-02-13T14:40:57Z'}],
+            'current_date': 1000198000,
+        }
+        latencies = []
+
+        def mock_get(*args, **kwargs):
+            response = utils.MockResponseGET()
+            response.json = lambda: data
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(METRICS, 'observe_latency',
+                            lambda cohort, seconds: latencies.append(seconds))
+        worker.poll('first')
+        assert latencies == [], (
+            'Уведомление о статусе при первом опросе не должно учитываться '
+            'как задержка доставки смены статуса.'
+        )
+        data['homeworks'][0]['status'] = 'approved'
+        worker.poll('first')
+        assert len(latencies) == 1
+
+    def test_poll_fans_out_to_subscribers(self, tmp_path, monkeypatch):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'token1', '101', subscribers=['201'])
+        config.subscribe('first', '301')
+        worker.reload()
+        assert worker.table.get('first').recipients == (101, 201, 301)
+
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'approved'}],
+            'current_date': 1000198000,
+        }
+        requests_sent = []
+        chats = []
+
+        def mock_get(*args, **kwargs):
+            requests_sent.append(kwargs)
+            response = utils.MockResponseGET()
+            response.json = lambda: data
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(
+            worker.sender, 'send_to_chat',
+            lambda chat_id, text: chats.append(chat_id) or True)
+        worker.poll('first')
+        assert len(requests_sent) == 1
+        assert sorted(chats) == [101, 201, 301], (
+            'Одна смена статуса должна доходить до всех подписчиков '
+            'арендатора за один запрос к API.'
+        )
+
+    def test_run_once_persists_state_and_counts_failures(self, tmp_path,
+                                                         monkeypatch):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'token1', '101')
+        config.upsert('second', 'token2', '102')
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'approved',
+                           'date_updated': '2020-02-13T14:40:57Z'}],
+            'current_date': 1000198000,
+        }
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            if headers['Authorization'] == 'OAuth token2':
+                return utils.MockResponseGET(
+                    http_status=HTTPStatus.INTERNAL_SERVER_ERROR)
+            response = utils.MockResponseGET()
+            response.json = lambda: data
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        assert worker.run_once() == (1, 1), (
+            'Пакетный запуск должен опросить всех арендаторов и вернуть '
+            'число успешных и неудачных опросов.'
+        )
+        assert run_batch(worker) == EXIT_PARTIAL
+
+        _, restarted = create_worker(tmp_path)
+        restarted.reload()
+        restarted.load_state()
+        first = restarted.table.get('first')
+        assert (first.cursor, first.status) == (1000198000, 'approved'), (
+            'Курсор и статус арендатора должны сохраняться между запусками.'
+        )
+        assert restarted.table.get('second').errors == 2
+
+    def test_stop_flushes_pending_digest(self, tmp_path):
+        config, worker = create_worker(tmp_path)
+        worker.digest = Digest(window=3600)
+        config.upsert('first', 'token1', '101')
+        worker.digest.add(['101'], ('hw123', 'approved'), 'text')
+        stop = threading.Event()
+        stop.set()
+        worker.run(stop)
+        assert len(worker.digest) == 0
+        assert worker.bot.chat_id == '101', (
+            'При остановке накопленный дайджест нужно отправить, иначе '
+            'уведомления потеряются после перезапуска.'
+        )
+
+    def test_save_state_writes_only_changed_tenants(self, tmp_path,
+                                                    monkeypatch):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'token1', '101')
+        config.upsert('second', 'token2', '102')
+        worker.reload()
+        assert worker.save_state() == 2
+        assert worker.save_state() == 0, (
+            'Неизменившиеся арендаторы не должны сохраняться повторно.'
+        )
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            utils.MockResponseGET(random_timestamp=1000198000)))
+        worker.poll('first')
+        assert worker.save_state() == 1
+
+        _, restarted = create_worker(tmp_path)
+        restarted.reload()
+        restarted.load_state()
+        assert restarted.table.get('first').cursor == 1000198000
+        assert restarted.save_state() == 0, (
+            'Восстановленное состояние не нужно сохранять заново.'
+        )
+
+    def test_cursor_kept_until_digest_sent(self, tmp_path, monkeypatch):
+        config, worker = create_worker(tmp_path)
+        worker.digest = Digest(window=3600)
+        config.upsert('first', 'token1', '101')
+        worker.reload()
+        worker.save_state()
+        response = utils.MockResponseGET()
+        response.json = lambda: {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'approved',
+                           'date_updated': '2020-02-13T14:40:57Z'}],
+            'current_date': 1000198000,
+        }
+        monkeypatch.setattr(requests, 'get',
+                            lambda *args, **kwargs: response)
+        worker.poll('first')
+        assert worker.save_state() == 0, (
+            'Пока смены ждут в дайджесте, сдвинутый курсор сохранять нельзя:'
+            ' после сбоя уведомления будут потеряны.'
+        )
+        _, restarted = create_worker(tmp_path)
+        restarted.reload()
+        restarted.load_state()
+        assert restarted.table.get('first').cursor != 1000198000
+
+        worker.flush(worker.digest.pop(now=float('inf')))
+        assert worker.bot.chat_id == 101
+        assert worker.save_state() == 1
+
+    def test_initial_status_not_exported_to_sinks(self, tmp_path,
+                                                  monkeypatch):
+        config, worker = create_worker(tmp_path)
+        emitted = []
+        worker.sinks = SimpleNamespace(emit=emitted.append)
+        config.upsert('first', 'token1', '101')
+        worker.reload()
+        data = {
+            'homeworks': [{'homework_name': 'hw123', 'status': 'reviewing',
+                           'date_updated': '2020-02-13T14:40:57Z'}],
+            'current_date': 1000198000,
+        }
+        response = utils.MockResponseGET()
+        response.json = lambda: data
+        monkeypatch.setattr(requests, 'get',
+                            lambda *args, **kwargs: response)
+        worker.poll('first')
+        assert emitted == [], (
+            'Статус, найденный при первом опросе, не является переходом и '
+            'не должен выгружаться в приёмники.'
+        )
+        data['homeworks'][0]['status'] = 'approved'
+        data['current_date'] += 1
+        worker.poll('first')
+        assert [transition.status for transition in emitted] == ['approved']
+
+    def test_run_once_prunes_old_delivery_marks(self, tmp_path):
+        _, worker = create_worker(tmp_path)
+        worker.outbox._conn.execute(
+            "INSERT INTO delivered VALUES ('101', '', 'notice', 0)")
+        worker.run_once()
+        assert not worker.outbox._conn.execute(
+            'SELECT 1 FROM delivered').fetchone(), (
+            'Старые отметки о доставке должны удаляться и в worker.py.'
+        )
+
+    def test_permanent_error_parks_tenant(self, tmp_path, monkeypatch):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'bad-token', '101')
+        worker.reload()
+        requests_sent = []
+
+        def mock_get(*args, **kwargs):
+            requests_sent.append(kwargs)
+            return utils.MockResponseGET(http_status=HTTPStatus.UNAUTHORIZED)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        worker.run_poll('first')
+        assert len(requests_sent) == 1, (
+            'Постоянная ошибка не должна повторяться внутри цикла.'
+        )
+        assert 'first' in worker.parked
+        assert 'first' not in worker.scheduler, (
+            'Арендатор с недействительным токеном не должен опрашиваться.'
+        )
+        worker.save_state()
+
+        config.upsert('first', 'new-token', '101')
+        _, restarted = create_worker(tmp_path)
+        restarted.reload()
+        restarted.load_state()
+        assert 'first' not in restarted.parked, (
+            'После смены токена опрос арендатора должен возобновиться.'
+        )
+
+    def test_saturated_outbox_holds_back_polls(self, tmp_path):
+        config, worker = create_worker(tmp_path)
+        worker.outbox.capacity = 1
+        config.upsert('first', 'token1', '101')
+        worker.reload()
+        worker.outbox.add('101', 'hw123', 'approved', 'pending')
+        assert worker.backpressure()
+        stop = threading.Event()
+        worker.pool.submit = lambda *args: stop.set()
+        thread = threading.Thread(target=worker.run, args=(stop,))
+        thread.start()
+        assert not stop.wait(0.2), (
+            'При переполненном outbox новые опросы не должны запускаться.'
+        )
+        worker.outbox.ack('101', 'hw123', 'approved')
+        stop.set()
+        thread.join()
+        assert not worker.backpressure()
+
+    def test_validate_parks_invalid_tenants(self, tmp_path, monkeypatch):
+        config, worker = create_worker(tmp_path)
+        config.upsert('good', 'token1', '101')
+        config.upsert('revoked', 'token2', '102')
+        config.upsert('lost', 'token3', '103')
+        worker.reload()
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            if headers['Authorization'] == 'OAuth token2':
+                return utils.MockResponseGET(
+                    http_status=HTTPStatus.UNAUTHORIZED)
+            return utils.MockResponseGET(random_timestamp=1000198000)
+
+        def get_chat(chat_id):
+            if chat_id == 103:
+                raise telegram.error.BadRequest('Chat not found')
+
+        requests_sent = []
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            requests_sent.append(kwargs) or mock_get(*args, **kwargs)))
+        worker.bot.get_chat = get_chat
+        assert worker.validate() == 1
+        assert worker.parked == {'lost'}
+        assert requests_sent == [], (
+            'Проверка при запуске не должна дублировать первый опрос API.'
+        )
+        due = [tenant_id for tenant_id, _
+               in worker.scheduler.pop_due(float('inf'))]
+        assert sorted(due) == ['good', 'revoked'], (
+            'Арендаторы с недоступным чатом должны останавливаться '
+            'до начала опроса.'
+        )
+        for tenant_id in due:
+            worker.run_poll(tenant_id)
+        assert worker.parked == {'revoked', 'lost'}, (
+            'Арендатор с отозванным токеном должен останавливаться '
+            'на первом опросе.'
+        )
+        assert worker.bot.chat_id == 102, (
+            'О недействительном токене нужно сообщить в чат арендатора.'
+        )
+
+    def test_same_failure_is_reported_again_after_recovery(self, tmp_path):
+        config, worker = create_worker(tmp_path)
+        config.upsert('first', 'token1', '101')
+        worker.reload()
+        sent = []
+        worker.bot.send_message = (
+            lambda chat_id=None, text=None, **kwargs: sent.append(text))
+        error = ConnectionError('503')
+        worker.fail('first', error)
+        worker.fail('first', error)
+        worker.table.record_error('first', failed=False)
+        worker.fail('first', error)
+        assert sent == ['Сбой в работе программы: 503'] * 2, (
+            'О сбое нужно сообщать один раз за серию ошибок, в том числе '
+            'если после восстановления повторился тот же сбой.'
+        )
@@ -0,0 +1,543 @@
+import argparse
+import datetime as dt
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import telegram
+from telegram.utils.request import Request
+
+import exceptions as ex
+import homework as hw
+import records
+from cache import ResponseCache
+from digest import DIGEST_WINDOW, Digest
+from governor import Governor
+from health import start_health_server
+from metrics import METRICS
+from outbox import PRIORITY_NOTICE, Outbox
+from polling import POLL_MAX_INTERVAL, poll_interval
+from profiler import Profiler
+from retry import RetryPolicy
+from scheduler import Scheduler
+from sender import SENDER_THREADS, Sender
+from sinks import Transition, from_config
+from tenant_config import TenantConfig
+from tenants import STATUS_CODES, TenantTable
+
+TENANTS_DB: str = os.getenv('TENANTS_DB', 'tenants.sqlite3')
+WORKER_THREADS: int = int(os.getenv('WORKER_THREADS', 16))
+CONFIG_POLL_PERIOD: int = 5
+OVERDUE_GRACE: int = 60
+GOVERNOR_SLACK: float = 0.05
+STATE_SAVE_PERIOD: int = 60
+PRUNE_PERIOD: int = 24 * 60 * 60
+EXIT_OK: int = 0
+EXIT_PARTIAL: int = 1
+EXIT_FAILED: int = 2
+
+
+def initial_timestamp():
+    """Начало окна опроса для нового арендатора: 50 дней назад."""
+    return int(time.mktime((dt.datetime.now()
+                            - dt.timedelta(days=50)).timetuple()))
+
+
+class Worker:
+    """Опрос API по всем арендаторам из конфигурации.
+
+    Опросы выполняются в пуле потоков, а изменения конфигурации
+    применяются между ними, не останавливая остальных арендаторов.
+    """
+
+    def __init__(self, bot, config, outbox, governor=None,
+                 threads=WORKER_THREADS):
+        self.bot = bot
+        self.config = config
+        self.outbox = outbox
+        self.governor = governor or Governor()
+        self.reserved: set = set()
+        self.parked: set = set()
+        self.retry = RetryPolicy()
+        self.sender = Sender(
+            lambda chat_id, text: hw.send_to_chat(bot, chat_id, text), outbox)
+        self.table = TenantTable()
+        self.scheduler = Scheduler()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(threads)
+        self.profiler = Profiler()
+        self.queued: dict = {}
+        self.delivering: set = set()
+        self.saturated = False
+        self.cache = ResponseCache()
+        self.sinks = from_config()
+        self.digest = (Digest(int(DIGEST_WINDOW))
+                       if DIGEST_WINDOW is not None else None)
+
+    def reload(self):
+        """Применяет изменения конфигурации арендаторов.
+
+        Изменение, которое не удалось применить, отклоняется с записью в
+        лог и не мешает остальным.
+        """
+        changes = self.config.changes()
+        with self.lock:
+            for change in changes:
+                try:
+                    self.apply(change)
+                except Exception as error:
+                    logging.error('Изменение арендатора'
+                                  f' {change.tenant_id} отклонено: {error}')
+        return len(changes)
+
+    def apply(self, change):
+        """Применяет одно изменение конфигурации арендатора."""
+        tenant_id = change.tenant_id
+        if change.deleted:
+            if tenant_id in self.table:
+                self.table.remove(tenant_id)
+            self.parked.discard(tenant_id)
+            self.scheduler.cancel(tenant_id)
+            logging.info(f'Арендатор {tenant_id} удалён.')
+            return
+        known = tenant_id in self.table
+        # Курсор задаётся только новому арендатору, у прежнего он сохраняется
+        self.table.add(tenant_id, change.token, change.chat_id,
+                       initial_timestamp(), change.cohort, change.subscribers)
+        if tenant_id in self.parked:
+            self.parked.discard(tenant_id)
+            self.table.dirty.add(tenant_id)
+            self.scheduler.schedule(tenant_id)
+            logging.info(f'Опрос арендатора {tenant_id} возобновлён.')
+        elif known:
+            logging.info(f'Настройки арендатора {tenant_id} обновлены.')
+        else:
+            self.scheduler.schedule(tenant_id)
+            logging.info(f'Арендатор {tenant_id} добавлен.')
+
+    def load_state(self):
+        """Восстанавливает курсоры и статусы арендаторов из конфигурации."""
+        rows = self.config.load_state()
+        with self.lock:
+            for tenant_id, cursor, status, updated_at, errors, parked in rows:
+                if tenant_id not in self.table or status not in STATUS_CODES:
+                    continue
+                self.table.restore(tenant_id, cursor, status, updated_at,
+                                   errors)
+                if parked:
+                    self.parked.add(tenant_id)
+                    self.scheduler.cancel(tenant_id)
+            METRICS.set('parked_tenants', len(self.parked))
+        return len(rows)
+
+    def save_state(self):
+        """Сохраняет изменившиеся курсоры и статусы арендаторов.
+
+        Арендатор, чьи уведомления ещё не попали в outbox (идёт рассылка
+        или смены ждут в дайджесте), сохраняется позже: иначе после сбоя
+        курсор уже сдвинут, а уведомления потеряны.
+        """
+        with self.lock:
+            tenants = [tenant for tenant in map(self.table.get,
+                                                self.table.dirty)
+                       if tenant is not None]
+            held = {tenant.tenant_id for tenant in tenants
+                    if self.holds(tenant)}
+            dirty, self.table.dirty = self.table.dirty - held, held
+            rows = [
+                (tenant.tenant_id, tenant.cursor, tenant.status,
+                 tenant.updated_at, tenant.errors,
+                 tenant.tenant_id in self.parked)
+                for tenant in tenants
+                if tenant.tenant_id not in held
+            ]
+        try:
+            self.config.save_state(rows)
+        except Exception:
+            with self.lock:
+                self.table.dirty |= dirty
+            raise
+        return len(rows)
+
+    def holds(self, tenant):
+        """Есть ли у арендатора уведомления, ещё не записанные в outbox."""
+        return tenant.tenant_id in self.delivering or (
+            self.digest is not None and self.digest.holds(tenant.recipients))
+
+    def poll(self, tenant_id):
+        """Опрашивает API для арендатора и уведомляет о смене статуса."""
+        with self.lock:
+            tenant = self.table.get(tenant_id)
+        if tenant is None:
+            return
+        headers = {'Authorization': f'OAuth {tenant.token}'}
+        cursor = tenant.cursor
+        entry = self.cache.get_or_refresh(
+            tenant_id,
+            lambda: (hw.request_api(headers, cursor, records.decode), cursor),
+            state=cursor)
+        if entry.state != cursor:
+            # Ответ на текущий курсор ещё не пришёл, а прежний уже разобран
+            return
+        answer = entry.response
+
+        # Курсор сдвигается после каждого опроса, поэтому в ответе только
+        # изменившиеся работы; при первом опросе берём последнюю из них
+        homeworks = answer.homeworks
+        initial = not tenant.status
+        if initial:
+            homeworks = homeworks[:1]
+        notices = [
+            (record.key, record.message, record.status.value,
+             record.updated_at)
+            for record in homeworks
+        ]
+        with self.lock:
+            if tenant_id not in self.table:
+                return
+            if notices and not self.table.set_status(tenant_id,
+                                                     *notices[0][2:]):
+                notices = []
+            self.table.set_cursor(tenant_id, answer.current_date)
+            self.table.record_error(tenant_id, failed=False)
+            # Разобранный ответ остаётся в кэше, но свежим больше не считается
+            entry.state = None
+            self.delivering.add(tenant_id)
+        try:
+            self.deliver(tenant, notices, initial)
+        finally:
+            with self.lock:
+                self.delivering.discard(tenant_id)
+
+    def deliver(self, tenant, notices, initial=False):
+        """Рассылает уведомления о сменах статусов, начиная со старых.
+
+        initial=True — первый опрос, прежний статус неизвестен: задержка
+        доставки для таких уведомлений не считается, а в приёмники они не
+        выгружаются, ведь смены статуса не было.
+        """
+        detected_at = time.time()
+        for key, message, status, updated in reversed(notices):
+            if self.sinks is not None and not initial:
+                self.sinks.emit(Transition(tenant.tenant_id, tenant.cohort,
+                                           key[0], status, updated,
+                                           detected_at))
+            changed_at = None if initial else updated or None
+            if self.digest is None:
+                self.sender.fan_out(tenant.recipients, key, message,
+                                    changed_at, tenant.cohort)
+            else:
+                self.digest.add(tenant.recipients, key, message, changed_at,
+                                tenant.cohort)
+        if self.digest is not None and not self.digest.window:
+            self.flush(self.digest.pop(tenant.recipients))
+
+    def flush(self, ready):
+        """Отправляет собранные дайджесты."""
+        for chat_id, key, text, changed_at, cohort in ready:
+            self.sender.send(chat_id, key, text, changed_at, cohort)
+
+    def run_poll(self, tenant_id):
+        """Опрос арендатора с обработкой ошибок и перепланированием."""
+        with self.lock:
+            due = self.queued.pop(tenant_id, None)
+        if due is not None:
+            METRICS.set('scheduler_lag', round(time.monotonic() - due, 3))
+        if self.defer(tenant_id, due):
+            return
+        delay = None
+        try:
+            with self.profiler.cycle():
+                self.retry.call(self.governor.paced(self.poll),
+                                tenant_id)
+        except ex.TooManyRequests as error:
+            self.governor.pause(error.retry_after)
+            delay = error.retry_after
+        except ex.PermanentError as error:
+            self.park(tenant_id, error)
+        except Exception as error:
+            logging.error(f'Сбой опроса арендатора {tenant_id}: {error}')
+            self.fail(tenant_id, error)
+        finally:
+            self.reschedule(tenant_id, delay)
+
+    def reschedule(self, tenant_id, delay=None):
+        """Планирует следующий опрос, по умолчанию — по состоянию работ."""
+        with self.lock:
+            tenant = self.table.get(tenant_id)
+            if tenant is None or tenant_id in self.parked:
+                return
+            if delay is None:
+                delay = (poll_interval(tenant.status, tenant.updated_at,
+                                       time.time())
+                         if not tenant.errors else hw.RETRY_PERIOD)
+            self.scheduler.schedule(tenant_id, delay)
+
+    def defer(self, tenant_id, due=None):
+        """Откладывает опрос до слота, выделенного governor.
+
+        Возвращает True, если опрос перенесён. Арендатор, уже
+        получивший слот, при следующем запуске опрашивается сразу.
+        due — изначальное время опроса, с него перенесённый опрос
+        считается просроченным.
+        """
+        with self.lock:
+            if tenant_id in self.reserved:
+                self.reserved.discard(tenant_id)
+                return False
+        delay = self.governor.reserve()
+        if delay <= GOVERNOR_SLACK:
+            return False
+        with self.lock:
+            if tenant_id in self.table:
+                self.reserved.add(tenant_id)
+                self.scheduler.schedule(tenant_id, delay, since=due)
+        return True
+
+    def fail(self, tenant_id, error):
+        """Учитывает ошибку и сообщает о первой из серии."""
+        with self.lock:
+            if tenant_id not in self.table:
+                return
+            errors = self.table.record_error(tenant_id)
+            chat_id = self.table.get(tenant_id).chat_id
+        if errors == 1:
+            message = f'Сбой в работе программы: {error}'
+            self.sender.send(chat_id, hw.notice_key(message), message,
+                             priority=PRIORITY_NOTICE)
+
+    def park(self, tenant_id, error, notify=True):
+        """Останавливает опрос арендатора до смены его настроек.
+
+        notify=False не пишет об этом в чат арендатора, например,
+        если чат недоступен.
+        """
+        logging.error(f'Опрос арендатора {tenant_id} остановлен: {error}')
+        with self.lock:
+            if tenant_id not in self.table:
+                return
+            self.parked.add(tenant_id)
+            self.table.dirty.add(tenant_id)
+            self.scheduler.cancel(tenant_id)
+            self.table.record_error(tenant_id)
+            chat_id = self.table.get(tenant_id).chat_id
+            METRICS.set('parked_tenants', len(self.parked))
+        if not notify:
+            return
+        message = f'Опрос остановлен до смены настроек: {error}'
+        self.sender.send(chat_id, hw.notice_key(message), message,
+                         priority=PRIORITY_NOTICE)
+
+    def probe(self, tenant):
+        """Проверяет доступность чата арендатора.
+
+        Возвращает исключение, из-за которого арендатора нужно
+        остановить, или None. Токен Практикума не проверяется: отказ в
+        доступе остановит арендатора на первом же опросе, без лишнего
+        запроса к API.
+        """
+        try:
+            self.bot.get_chat(tenant.chat_id)
+        except (telegram.error.BadRequest,
+                telegram.error.Unauthorized) as error:
+            return error
+        except Exception as error:
+            logging.warning(f'Не удалось проверить арендатора'
+                            f' {tenant.tenant_id}: {error}')
+        return None
+
+    def validate(self):
+        """Проверяет чаты всех арендаторов параллельно перед опросом.
+
+        Арендаторы с недоступным чатом останавливаются до смены
+        настроек. Пока идёт проверка, цикл отмечается живым.
+        Возвращает число остановленных.
+        """
+        started = time.monotonic()
+        with self.lock:
+            tenants = [self.table.get(tenant_id) for tenant_id in self.table
+                       if tenant_id not in self.parked]
+        pending = {self.pool.submit(self.probe, tenant): tenant
+                   for tenant in tenants}
+        parked = 0
+        while pending:
+            METRICS.mark('cycle')
+            done, _ = wait(pending, timeout=CONFIG_POLL_PERIOD)
+            for future in done:
+                tenant = pending.pop(future)
+                error = future.result()
+                if error is not None:
+                    self.park(tenant.tenant_id, error, notify=False)
+                    parked += 1
+        elapsed = time.monotonic() - started
+        METRICS.set('validation_time', round(elapsed, 3))
+        logging.info(f'Проверено арендаторов: {len(tenants)} за'
+                     f' {elapsed:.1f} с, остановлено: {parked}.')
+        return parked
+
+    def backpressure(self):
+        """Сообщает, что outbox переполнен и новые опросы нужно придержать."""
+        saturated = self.outbox.saturated()
+        if saturated != self.saturated:
+            self.saturated = saturated
+            METRICS.set('backpressure', int(saturated))
+            if saturated:
+                logging.warning('Outbox переполнен, опросы приостановлены.')
+            else:
+                logging.info('Очередь outbox разобрана, опросы возобновлены.')
+        return saturated
+
+    def publish(self, now):
+        """Обновляет показатели очереди для проб здоровья."""
+        METRICS.mark('cycle')
+        METRICS.set('queue_depth', len(self.queued))
+        # Просроченные ждут и в пуле, и в расписании: при backpressure
+        # или после переноса governor
+        METRICS.set('overdue_tenants', sum(
+            now - due > OVERDUE_GRACE for due in self.queued.values())
+            + self.scheduler.overdue(now - OVERDUE_GRACE))
+
+    def poll_once(self, tenant_id):
+        """Опрос арендатора в пакетном режиме.
+
+        Слот governor не переносит опрос, а выжидается на месте.
+        Возвращает True при успешном опросе.
+        """
+        self.governor.wait()
+        try:
+            with self.profiler.cycle():
+                self.retry.call(self.governor.paced(self.poll),
+                                tenant_id)
+        except ex.TooManyRequests as error:
+            self.governor.pause(error.retry_after)
+            logging.warning(f'Опрос арендатора {tenant_id} пропущен: {error}')
+            return False
+        except ex.PermanentError as error:
+            self.park(tenant_id, error)
+            return False
+        except Exception as error:
+            logging.error(f'Сбой опроса арендатора {tenant_id}: {error}')
+            self.fail(tenant_id, error)
+            return False
+        return True
+
+    def run_once(self):
+        """Опрашивает всех арендаторов один раз для запуска по расписанию.
+
+        Перед опросом досылаются уведомления, оставшиеся с прошлых
+        запусков, после него сохраняется состояние арендаторов.
+        Возвращает число успешных и неудачных опросов.
+        """
+        self.reload()
+        self.load_state()
+        self.outbox.prune()
+        self.outbox.flush(self.sender.send_to_chat)
+        with self.lock:
+            tenant_ids = [tenant_id for tenant_id in self.table
+                          if tenant_id not in self.parked]
+        results = list(self.pool.map(self.poll_once, tenant_ids))
+        if self.digest is not None:
+            self.flush(self.digest.pop(now=math.inf))
+        self.save_state()
+        if self.sinks is not None:
+            self.sinks.close()
+        return results.count(True), results.count(False)
+
+    def run(self, stop=None, validate=False):
+        """Основной цикл: применяет конфигурацию и раздаёт опросы пулу.
+
+        validate=True перед первым опросом проверяет арендаторов.
+        """
+        stop = stop or threading.Event()
+        self.reload()
+        self.load_state()
+        if validate:
+            self.validate()
+        next_reload = next_save = time.monotonic() + CONFIG_POLL_PERIOD
+        next_prune = time.monotonic()
+        while not stop.is_set():
+            now = time.monotonic()
+            if now >= next_reload:
+                self.reload()
+                next_reload = now + CONFIG_POLL_PERIOD
+            if now >= next_save:
+                self.save_state()
+                next_save = now + STATE_SAVE_PERIOD
+            if now >= next_prune:
+                self.outbox.prune()
+                next_prune = now + PRUNE_PERIOD
+            saturated = self.backpressure()
+            with self.lock:
+                due = [] if saturated else self.scheduler.pop_due(now)
+                wait = self.scheduler.next_due()
+                self.queued.update(due)
+                self.publish(now)
+            for tenant_id, _ in due:
+                self.pool.submit(self.run_poll, tenant_id)
+            if self.digest is not None and self.digest.window:
+                ready = self.digest.pop(now=now)
+                if ready:
+                    self.pool.submit(self.flush, ready)
+            if wait is None or wait > CONFIG_POLL_PERIOD:
+                wait = CONFIG_POLL_PERIOD
+            stop.wait(wait)
+        # Опросы в работе дописывают дайджест, а его остаток отправляется
+        # до сохранения курсоров, иначе он потеряется при перезапуске
+        self.pool.shutdown(wait=True)
+        if self.digest is not None:
+            self.flush(self.digest.pop(now=math.inf))
+        self.save_state()
+        if self.sinks is not None:
+            self.sinks.close()
+
+
+def run_batch(worker):
+    """Однократный опрос всех арендаторов; возвращает код выхода."""
+    started = time.monotonic()
+    succeeded, failed = worker.run_once()
+    logging.info(
+        f'Опрошено арендаторов: {succeeded + failed} за'
+        f' {time.monotonic() - started:.1f} с, с ошибками: {failed},'
+        f' неотправленных уведомлений: {len(worker.outbox)}.')
+    if not failed:
+        return EXIT_OK
+    return EXIT_PARTIAL if succeeded else EXIT_FAILED
+
+
+def main():
+    """Запуск опроса по всем арендаторам из TENANTS_DB."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--once', action='store_true',
+                        help='опросить всех арендаторов один раз и выйти')
+    args = parser.parse_args()
+    if not hw.TELEGRAM_TOKEN:
+        logging.critical('Отсутсвуют переменные окружения!')
+        raise ex.MissingEnvironmentVariable(
+            'Отсутствуют переменные окружения!')
+
+    # Соединения с Bot API используют все потоки опроса и рассылки
+    bot = telegram.Bot(token=hw.TELEGRAM_TOKEN, request=Request(
+        con_pool_size=WORKER_THREADS + SENDER_THREADS))
+    worker = Worker(bot, TenantConfig(TENANTS_DB), Outbox(hw.OUTBOX_PATH))
+    if args.once:
+        return run_batch(worker)
+    worker.profiler.install_signal()
+    # Адаптивный интервал опроса доходит до POLL_MAX_INTERVAL, столько же
+    # готовность ждёт успешного ответа API
+    start_health_server(CONFIG_POLL_PERIOD, POLL_MAX_INTERVAL)
+    worker.outbox.start_worker(worker.sender.send_to_chat)
+    worker.run(validate=True)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO,
+        handlers=[logging.FileHandler('homework_log.log'),
+                  logging.StreamHandler()]
+    )
+    sys.exit(main())